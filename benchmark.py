@@ -0,0 +1,506 @@
+# -*- coding: utf-8 -*-
+"""工具箱性能基准（无需图形界面）
+
+用法示例：
+    python benchmark.py convert                       # 生成合成图片并测试转换核心
+    python benchmark.py convert --workers 4 -o result.json
+    python benchmark.py convert --baseline base.json  # 与基线比较，有文件失败或发现回退时返回码为1
+    python benchmark.py rename                        # 在tmpfs上生成1千/10万个文件测试重命名核心
+    python benchmark.py rename --huge --path /mnt/nas # 追加100万文件规模，并在指定路径上测试
+"""
+# ==================== 导入依赖库 ====================
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import itertools
+import tracemalloc
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+try:
+    import resource  # 仅类Unix系统可用
+except ImportError:
+    resource = None
+
+# ==================== 加载工具箱模块 ====================
+TOOLBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "工具箱v5.0.py")
+_spec = importlib.util.spec_from_file_location("toolbox", TOOLBOX_PATH)
+toolbox = importlib.util.module_from_spec(_spec)
+sys.modules["toolbox"] = toolbox  # 子进程反序列化任务时需要按名称找到模块
+_spec.loader.exec_module(toolbox)
+
+# ==================== 基准配置 ====================
+OUTPUT_FORMATS = ['png', 'jpeg', 'bmp', 'webp', 'ico']
+INPUT_FORMATS = ['PNG', 'JPEG', 'WEBP', 'BMP', 'ICO']
+IMAGE_MODES = ['RGB', 'RGBA', 'P']
+IMAGE_SIZES = [(320, 240), (1280, 960), (3000, 2000)]
+COMPRESSION_SETTINGS = {
+    'compressed': {'compress': True, 'max_size': 1000, 'quality': 85},
+    'uncompressed': {'compress': False, 'max_size': 99999, 'quality': 100},
+}
+
+RENAME_SIZES = [1000, 100000]
+RENAME_HUGE_SIZE = 1000000
+RENAME_SORT_MODES = ['name', 'modified', 'created', 'exif']
+RENAME_SUFFIXES = {'keep_ext': '', 'suffix': '.bin'}
+COUNTED_OS_CALLS = ('scandir', 'listdir', 'stat', 'lstat', 'rename', 'fsync')
+EXIF_SAMPLE_TIME = b'2001:01:01 00:00:00'  # 合成JPEG中的拍摄时间占位，逐个文件替换为不同时间
+
+# 数值越大越好为1，越小越好为-1
+REGRESSION_METRICS = {'images_per_sec': 1, 'p95_ms': -1, 'renames_per_sec': 1, 'os_calls_total': -1,
+                      'failures': -1}
+
+
+# ==================== 工具函数 ====================
+def self_peak_rss_kb():
+    """本进程的峰值常驻内存（KB）
+
+    Linux的 ru_maxrss 在 execve 后仍保留父进程fork时的值，这里优先读取 /proc 中的 VmHWM
+    （随新地址空间重新计数）；其他平台退回 ru_maxrss
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / 1024 if sys.platform == 'darwin' else usage  # macOS以字节为单位
+
+
+def peak_rss_mb():
+    """返回本进程及已结束子进程的峰值常驻内存（MB），不支持的平台返回None
+
+    峰值只增不减，因此每个场景都在 run_isolated 启动的新进程中测量
+    """
+    if resource is None:
+        return None
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == 'darwin':
+        children /= 1024
+    return round(max(self_peak_rss_kb(), children) / 1024, 1)
+
+
+def run_isolated(func, *args):
+    """在新启动（spawn）的进程中执行一个场景并返回其结果，使峰值内存只反映该场景"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def timed_convert(input_path, output_dir, options):
+    """转换单个文件并返回 (输入字节数, 耗时秒)，供进程池调用"""
+    start = time.perf_counter()
+    result = toolbox.convert_image(input_path, output_dir, options)
+    return result['in_bytes'], time.perf_counter() - start
+
+
+class CountedDirEntry:
+    """包装os.DirEntry，统计真正访问磁盘的stat()
+
+    DirEntry.stat() 在Linux上首次调用时执行一次stat系统调用并缓存结果，
+    之后的调用不再访问磁盘，因此每个条目只计第一次
+    """
+
+    __slots__ = ('_entry', '_counts', '_stated')
+
+    def __init__(self, entry, counts):
+        self._entry = entry
+        self._counts = counts
+        self._stated = False
+
+    name = property(lambda self: self._entry.name)
+    path = property(lambda self: self._entry.path)
+
+    def stat(self, *, follow_symlinks=True):
+        if not self._stated:
+            self._stated = True
+            self._counts['entry_stat'] += 1
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+    def is_file(self, *, follow_symlinks=True):
+        return self._entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_dir(self, *, follow_symlinks=True):
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self):
+        return self._entry.is_symlink()
+
+    def inode(self):
+        return self._entry.inode()
+
+    def __fspath__(self):
+        return self._entry.path
+
+
+class CountedScandir:
+    """os.scandir 迭代器的包装，产出 CountedDirEntry"""
+
+    def __init__(self, iterator, counts):
+        self._iterator = iterator
+        self._counts = counts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        for entry in self._iterator:
+            yield CountedDirEntry(entry, self._counts)
+
+    def close(self):
+        self._iterator.close()
+
+
+class OsCallCounter:
+    """在上下文中替换os模块的函数以统计调用次数（工具箱通过os模块属性调用，因此能被统计到）
+
+    scandir 返回的条目同样被包装，DirEntry.stat() 的首次（实际访问磁盘的）调用计入 entry_stat；
+    通过内置open读取文件头等操作不在统计范围内
+    """
+
+    def __init__(self, names=COUNTED_OS_CALLS):
+        self.names = names
+        self.counts = dict.fromkeys(names + ('entry_stat',), 0)
+        self.originals = {}
+
+    def __enter__(self):
+        for name in self.names:
+            original = getattr(os, name)
+            self.originals[name] = original
+            setattr(os, name, self._wrap(name, original))
+        scandir = self.originals.get('scandir')
+        if scandir is not None:
+            counts = self.counts
+
+            def counted_scandir(*args, **kwargs):
+                counts['scandir'] += 1
+                return CountedScandir(scandir(*args, **kwargs), counts)
+            os.scandir = counted_scandir
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self.originals.items():
+            setattr(os, name, original)
+
+    def _wrap(self, name, original):
+        counts = self.counts
+
+        def counted(*args, **kwargs):
+            counts[name] += 1
+            return original(*args, **kwargs)
+        return counted
+
+
+# ==================== 合成图片 ====================
+def make_image(rng, size, mode):
+    """生成带噪声和渐变的合成图片，使压缩率接近真实照片"""
+    width, height = size
+    noise = Image.effect_noise(size, rng.randint(20, 80)).convert('RGB')
+    gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+    img = Image.blend(noise, gradient, 0.5)
+    if mode == 'RGBA':
+        img.putalpha(Image.linear_gradient('L').rotate(90).resize(size))
+    elif mode == 'P':
+        img = img.quantize(colors=64)
+    return img
+
+
+def generate_corpus(folder, count, seed=0):
+    """生成混合尺寸、色彩模式和格式的合成图片集，返回文件路径列表"""
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        size = IMAGE_SIZES[i % len(IMAGE_SIZES)]
+        mode = IMAGE_MODES[(i // len(IMAGE_SIZES)) % len(IMAGE_MODES)]
+        fmt = INPUT_FORMATS[i % len(INPUT_FORMATS)]
+        img = make_image(rng, size, mode)
+        if fmt == 'JPEG' and img.mode != 'RGB':
+            img = img.convert('RGB')  # JPEG不支持透明和调色板
+        if fmt == 'ICO':
+            img.thumbnail((256, 256))  # ICO最大256像素
+        path = os.path.join(folder, f"bench_{i:04d}.{fmt.lower()}")
+        img.save(path, format=fmt)
+        paths.append(path)
+    return paths
+
+
+# ==================== 基准执行 ====================
+def run_scenario(paths, output_format, settings, workers):
+    """对图片集执行一种输出格式与压缩设置组合，返回统计结果"""
+    options = dict(settings, format=output_format, target_kb=None,
+                   ico_sizes=[256] if output_format == 'ico' else None)
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    latencies = []
+    total_bytes = 0
+    failed_files = []
+    start = time.perf_counter()
+    try:
+        if workers <= 1:
+            for path in paths:
+                try:
+                    in_bytes, elapsed = timed_convert(path, output_dir, options)
+                    total_bytes += in_bytes
+                    latencies.append(elapsed)
+                except Exception as e:
+                    failed_files.append(f"{os.path.basename(path)}: {e}")
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(timed_convert, path, output_dir, options): path for path in paths}
+                for future in as_completed(futures):
+                    try:
+                        in_bytes, elapsed = future.result()
+                        total_bytes += in_bytes
+                        latencies.append(elapsed)
+                    except Exception as e:
+                        failed_files.append(f"{os.path.basename(futures[future])}: {e}")
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        'files': len(latencies),
+        'failures': len(failed_files),
+        'failed_files': sorted(failed_files),
+        'images_per_sec': round(len(latencies) / wall, 2) if wall else 0.0,
+        'mb_per_sec': round(total_bytes / 1024 / 1024 / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def scenario_failures(results):
+    """列出有失败文件的场景：失败的场景吞吐和延迟没有意义，无论是否比较基线都视为错误"""
+    lines = []
+    for name, current in results.items():
+        if current.get('failures'):
+            lines.append(f"{name}: 失败 {current['failures']} 个")
+            lines.extend(f"  {detail}" for detail in current.get('failed_files', []))
+    return lines
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """与基线比较：吞吐下降、延迟或系统调用次数上升超过容差即视为回退"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, direction in REGRESSION_METRICS.items():
+            if metric not in current or metric not in base:
+                continue
+            if direction > 0 and current[metric] < base[metric] * (1 - tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]} → {current[metric]}")
+            elif direction < 0 and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]} → {current[metric]}")
+    return regressions
+
+
+def bench_convert(args):
+    """图片转换基准入口"""
+    corpus_dir = args.corpus or tempfile.mkdtemp(prefix="bench_corpus_")
+    try:
+        paths = generate_corpus(corpus_dir, args.count, args.seed)
+        results = {}
+        for output_format in args.formats:
+            for setting_name, settings in COMPRESSION_SETTINGS.items():
+                name = f"{output_format}/{setting_name}"
+                results[name] = run_isolated(run_scenario, paths, output_format, settings, args.workers)
+                print(f"{name}: {results[name]['images_per_sec']} 张/秒", file=sys.stderr)
+    finally:
+        if not args.corpus:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+    return results
+
+
+# ==================== 重命名基准 ====================
+def default_rename_root():
+    """优先使用tmpfs（/dev/shm），排除磁盘因素只测核心开销"""
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def make_exif_jpeg():
+    """生成带EXIF拍摄时间的最小JPEG，返回字节内容（拍摄时间为 EXIF_SAMPLE_TIME 占位）"""
+    exif = Image.Exif()
+    exif.get_ifd(toolbox.EXIF_IFD)[36867] = EXIF_SAMPLE_TIME.decode()
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(buffer, format='JPEG', exif=exif.tobytes())
+    data = buffer.getvalue()
+    assert data.count(EXIF_SAMPLE_TIME) == 1
+    return data
+
+
+def generate_flat_directory(folder, count, seed=0, exif=False):
+    """生成count个文件，名称随机打乱，使名称排序与创建时间排序不同
+
+    默认生成空的 .dat 文件；exif 为True时生成带随机拍摄时间的小JPEG，使拍摄时间排序真正读取文件头
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    order = list(range(count))
+    rng.shuffle(order)
+    template = make_exif_jpeg() if exif else b''
+    for i in order:
+        ext = '.jpg' if exif else '.dat'
+        content = template
+        if exif:
+            stamp = time.strftime('%Y:%m:%d %H:%M:%S', time.gmtime(rng.randrange(946684800, 1700000000)))
+            content = template.replace(EXIF_SAMPLE_TIME, stamp.encode())
+        with open(os.path.join(folder, f"src_{i:07d}_{rng.randrange(1 << 30):08x}{ext}"), 'wb') as f:
+            f.write(content)
+
+
+def run_rename_scenario(folder, prefix, sort_by, suffix, trace_memory):
+    """对目录执行一次完整的重命名（含日志落盘），返回统计结果"""
+    journal_path = folder + '.journal'
+    journal = toolbox.RenameJournal(journal_path)
+    errors = []
+
+    def log(msg_type, text):
+        if msg_type == "error":
+            errors.append(text)
+
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        journal.begin(folder)
+        with OsCallCounter() as counter:
+            start = time.perf_counter()
+            renamed, conflicts, failed = toolbox.rename_directory(
+                folder, log, prefix=prefix, sort_by=sort_by, padding=7, suffix=suffix, journal=journal)
+            wall = time.perf_counter() - start
+        journal.commit()
+        peak_alloc = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        journal.close()
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+
+    return {
+        'files': renamed,
+        'conflicts': conflicts,
+        'failures': failed + len(errors),
+        'failed_files': errors,
+        'seconds': round(wall, 3),
+        'renames_per_sec': round(renamed / wall, 1) if wall else 0.0,
+        'os_calls': counter.counts,
+        'os_calls_total': sum(counter.counts.values()),
+        'peak_alloc_mb': round(peak_alloc / 1024 / 1024, 1) if peak_alloc is not None else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def bench_rename(args):
+    """重命名基准入口：每种规模 × 排序方式 × 是否统一后缀"""
+    sizes = args.sizes + ([RENAME_HUGE_SIZE] if args.huge else [])
+    base = tempfile.mkdtemp(prefix="bench_rename_", dir=args.path or default_rename_root())
+    results = {}
+    prefixes = (f"r{i}" for i in itertools.count())  # 每轮换前缀，保证所有文件都需要改名
+    try:
+        for count in sizes:
+            folder = os.path.join(base, f"n{count}")
+            generate_flat_directory(folder, count, args.seed)
+            for sort_by in args.sorts:
+                target = folder
+                if sort_by == 'exif':
+                    # 拍摄时间排序使用单独的JPEG目录（统一后缀场景放在最后，此前扩展名保持.jpg）
+                    target = os.path.join(base, f"n{count}_exif")
+                    shutil.rmtree(target, ignore_errors=True)
+                    generate_flat_directory(target, count, args.seed, exif=True)
+                for suffix_name, suffix in RENAME_SUFFIXES.items():
+                    name = f"{count}/{sort_by}/{suffix_name}"
+                    results[name] = run_isolated(run_rename_scenario, target, next(prefixes), sort_by, suffix,
+                                                 args.trace_memory)
+                    print(f"{name}: {results[name]['renames_per_sec']} 个/秒", file=sys.stderr)
+            shutil.rmtree(os.path.join(base, f"n{count}"), ignore_errors=True)
+            shutil.rmtree(os.path.join(base, f"n{count}_exif"), ignore_errors=True)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+    return results
+
+
+# ==================== 程序入口 ====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="工具箱性能基准")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help="图片格式转换基准")
+    convert_parser.add_argument('--count', type=int, default=60, help="合成图片数量")
+    convert_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    convert_parser.add_argument('--corpus', help="合成图片保存目录（默认使用临时目录并在结束后删除）")
+    convert_parser.add_argument('--workers', type=int, default=1, help="并行进程数（1为单进程）")
+    convert_parser.add_argument('--formats', nargs='+', default=OUTPUT_FORMATS,
+                                choices=OUTPUT_FORMATS, help="测试的输出格式")
+    convert_parser.set_defaults(func=bench_convert)
+
+    rename_parser = subparsers.add_parser('rename', help="批量重命名基准")
+    rename_parser.add_argument('--sizes', type=int, nargs='+', default=RENAME_SIZES, help="每个目录的文件数")
+    rename_parser.add_argument('--huge', action='store_true', help=f"追加 {RENAME_HUGE_SIZE} 个文件的规模")
+    rename_parser.add_argument('--path', help="在指定路径下生成测试目录（默认 /dev/shm 或系统临时目录）")
+    rename_parser.add_argument('--sorts', nargs='+', default=RENAME_SORT_MODES,
+                               choices=RENAME_SORT_MODES, help="测试的排序方式")
+    rename_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    rename_parser.add_argument('--trace-memory', action='store_true',
+                               help="用tracemalloc统计每个场景的峰值分配（会降低吞吐，勿与无此选项的基线比较）")
+    rename_parser.set_defaults(func=bench_rename)
+
+    for sub in (convert_parser, rename_parser):
+        sub.add_argument('-o', '--output', help="结果JSON保存路径（默认输出到标准输出）")
+        sub.add_argument('--baseline', help="基线JSON路径，用于检测性能回退")
+        sub.add_argument('--tolerance', type=float, default=0.10, help="允许的相对波动（默认0.10）")
+
+    args = parser.parse_args(argv)
+    results = args.func(args)
+
+    report = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+
+    status = 0
+    failures = scenario_failures(results)
+    for line in failures:
+        print(f"场景失败：{line}", file=sys.stderr)
+    if failures:
+        status = 1
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"性能回退：{line}", file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
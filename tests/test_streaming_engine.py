@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""流式引擎与完整引擎输出一致性的回归检查（python -m pytest tests）"""
+import os
+import sys
+import zipfile
+import importlib.util
+
+from openpyxl import Workbook, load_workbook
+
+TOOLBOX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "工具箱v5.0.py")
+_spec = importlib.util.spec_from_file_location("toolbox", TOOLBOX_PATH)
+toolbox = importlib.util.module_from_spec(_spec)
+sys.modules.setdefault("toolbox", toolbox)
+_spec.loader.exec_module(toolbox)
+
+SHEET_XML = 'xl/worksheets/sheet1.xml'
+
+
+def make_stale_dimension_workbook(path, rows=10, cols=3):
+    """生成 rows×cols 个值、但 <dimension> 记录为 A1:B2 的工作簿（模拟其他程序写出的过时记录）"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'S'
+    for r in range(1, rows + 1):
+        ws.append([f"https://pan.baidu.com/s/{r}" if c == 1 else f"r{r}c{c}" for c in range(1, cols + 1)])
+    ws['C1'].hyperlink = "https://example.com/c1"
+    plain = path + '.plain.xlsx'
+    wb.save(plain)
+    with zipfile.ZipFile(plain) as src, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for name in src.namelist():
+            data = src.read(name)
+            if name == SHEET_XML:
+                dimension = f'<dimension ref="A1:{chr(64 + cols)}{rows}" />'.encode()
+                assert dimension in data
+                data = data.replace(dimension, b'<dimension ref="A1:B2" />')
+            dst.writestr(name, data)
+    os.remove(plain)
+
+
+def cell_contents(path):
+    wb = load_workbook(path)
+    return {name: [[(cell.value, cell.hyperlink.target if cell.hyperlink else None) for cell in row]
+                   for row in wb[name].iter_rows()]
+            for name in wb.sheetnames}
+
+
+def test_stale_dimension_streaming_matches_full(tmp_path):
+    source = str(tmp_path / 'stale.xlsx')
+    make_stale_dimension_workbook(source)
+    matcher = toolbox.LinkPatternMatcher([("百度网盘", r"(https?://pan\.baidu\.com/[^\s]+)", "百度网盘资源")])
+    for direction, options in (('to_link', toolbox.link_options("display", matcher)), ('to_text', None)):
+        outputs = {}
+        processed = {}
+        for streaming in (False, True):
+            output = str(tmp_path / f'{direction}_{streaming}.xlsx')
+            processed[streaming] = toolbox.convert_workbook(source, output, direction, None, options,
+                                                            streaming=streaming)
+            outputs[streaming] = cell_contents(output)
+        assert processed[True] == processed[False]
+        assert outputs[True] == outputs[False]
+        assert len(outputs[True]['S']) == 10
+
+
+def test_scan_worksheet_across_chunk_boundaries(tmp_path, monkeypatch):
+    source = str(tmp_path / 'stale.xlsx')
+    make_stale_dimension_workbook(source, rows=50)
+    monkeypatch.setattr(toolbox, 'SHEET_SCAN_CHUNK', 7)
+    with zipfile.ZipFile(source) as archive:
+        assert toolbox.scan_worksheet(archive, SHEET_XML) == (True, 50)
@@ -1,16 +1,45 @@
 # -*- coding: utf-8 -*-
 # ==================== 导入依赖库 ====================
 import os
+import io
+import sys
+import math
+import time
+import hashlib
+import sqlite3
+import mmap
+import bisect
+import select
+import struct
+import ctypes
+import ctypes.util
+import itertools
+from collections import deque
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-from threading import Thread
+from threading import Thread, Lock, Event
 from queue import Queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image  # 图像处理库
 import openpyxl  # Excel处理库
-from openpyxl import load_workbook
+from openpyxl import load_workbook, Workbook
 from openpyxl.styles import Font
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.styleable import StyleableObject
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.cell.read_only import ReadOnlyCell
+from openpyxl.worksheet.hyperlink import Hyperlink
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.packaging.relationship import get_rels_path
+from openpyxl.xml.constants import SHEET_MAIN_NS, REL_NS, PKG_REL_NS
+from xml.etree.ElementTree import iterparse
 import re
 import json  # 用于保存配置文件
+import csv
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
 
 # ==================== 全局样式配置 ====================
 COLORS = {
@@ -75,6 +104,46 @@ class MainApplication:
                   foreground=[('active', 'white')])
 
 
+# ==================== 进度事件通道 ====================
+class ProgressChannel:
+    """进度事件通道：后台线程只累加计数，界面线程定时批量读取并刷新控件"""
+
+    def __init__(self, **counters):
+        self._lock = Lock()
+        self._values = dict(counters, finished=False)
+        self.started = time.monotonic()
+        self.finished_at = None
+
+    def add(self, **deltas):
+        """累加计数（后台线程调用）"""
+        with self._lock:
+            for key, delta in deltas.items():
+                self._values[key] = self._values.get(key, 0) + delta
+
+    def set(self, **values):
+        """设置状态值（后台线程调用）"""
+        with self._lock:
+            self._values.update(values)
+
+    def finish(self):
+        """标记任务结束并冻结计时（后台线程调用）"""
+        with self._lock:
+            self._values['finished'] = True
+            self.finished_at = time.monotonic()
+
+    def snapshot(self):
+        """返回计数副本和已用秒数（界面线程调用）"""
+        with self._lock:
+            end = self.finished_at if self.finished_at is not None else time.monotonic()
+            return dict(self._values), end - self.started
+
+
+def format_duration(seconds):
+    """把秒数格式化为 H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
 # ==================== 模块基类 ====================
 class BaseModule:
     """所有功能模块的基类"""
@@ -105,12 +174,1225 @@ class BaseModule:
         self.log_area.config(state=tk.DISABLED)
 
 
+# ==================== 批量重命名核心 ====================
+class DirectorySnapshot:
+    """单次os.scandir得到的目录快照，作为排序和重命名的唯一数据来源
+
+    DirEntry会缓存条目类型；stat()首次调用后同样缓存（Windows在扫描时即已取得），
+    网络共享上每个条目最多一次往返
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with os.scandir(directory) as entries:
+            self.entries = list(entries)
+        self.names = {entry.name for entry in self.entries}  # 目录中全部名称，用于冲突检查
+        self._name_key = None
+
+    def name_key(self):
+        """返回比较名称用的键函数：大小写不敏感的卷（NTFS、默认APFS）上按casefold比较
+
+        取目录中一个含字母的名称，检查其大小写互换后的名称是否指向同一条目；
+        没有可用名称时退回 os.path.normcase 的平台约定
+        """
+        if self._name_key is None:
+            probe = next((name for name in self.names if name.swapcase() != name
+                          and name.swapcase() not in self.names), None)
+            if probe is not None:
+                insensitive = os.path.lexists(os.path.join(self.directory, probe.swapcase()))
+            else:
+                insensitive = os.path.normcase('A') == 'a'
+            self._name_key = str.casefold if insensitive else str
+        return self._name_key
+
+    def select(self, kind='files', extensions=None):
+        """按类型筛选条目：kind 为 files / dirs / all；extensions 为小写含点号的后缀元组（仅作用于文件）"""
+        selected = []
+        for entry in self.entries:
+            is_file = entry.is_file()
+            if kind == 'files' and not is_file:
+                continue
+            if kind == 'dirs' and not entry.is_dir():
+                continue
+            if extensions and is_file and not entry.name.lower().endswith(extensions):
+                continue
+            selected.append(entry)
+        return selected
+
+    def subdirectories(self):
+        """返回子目录路径列表（不跟随符号链接，避免循环；重复文件目录不参与递归）"""
+        return [entry.path for entry in self.entries
+                if entry.is_dir(follow_symlinks=False) and entry.name != DUPLICATES_DIR]
+
+    @staticmethod
+    def sort_key(sort_by):
+        """返回排序键函数，时间信息来自DirEntry缓存的stat"""
+        return {
+            'name': lambda entry: entry.name.lower(),  # 按名称排序（不区分大小写）
+            'modified': lambda entry: entry.stat().st_mtime,
+            'created': lambda entry: entry.stat().st_ctime,
+            'exif': lambda entry: (capture_time(entry), entry.name.lower())
+        }[sort_by]
+
+
+# 拍摄时间：只读取文件头中的EXIF，不解码像素
+EXIF_IMAGE_EXTS = ('.jpg', '.jpeg', '.tif', '.tiff', '.webp')  # PNG的getexif在缺少eXIf块时会解码整幅图像，不读取
+EXIF_IFD = 0x8769
+EXIF_TIME_TAGS = ((EXIF_IFD, 36867), (EXIF_IFD, 36868), (None, 306))  # 拍摄时间 → 数字化时间 → 修改时间
+CAPTURE_TIME_CACHE_SIZE = 100000  # 缓存条目上限，超出后淘汰最早写入的条目
+_capture_time_cache = {}  # (路径, 大小, mtime_ns) → 拍摄时间戳或None
+_capture_time_lock = Lock()
+
+
+def read_capture_time(path):
+    """读取EXIF拍摄时间（时间戳），没有或无法解析时返回None
+
+    Image.open 只解析文件头，getexif 不会触发像素解码
+    """
+    try:
+        with Image.open(path) as img:
+            exif = img.getexif()
+            for ifd, tag in EXIF_TIME_TAGS:
+                value = (exif.get_ifd(ifd) if ifd else exif).get(tag)
+                if not value:
+                    continue
+                try:
+                    return time.mktime(time.strptime(str(value).strip('\x00 ')[:19], '%Y:%m:%d %H:%M:%S'))
+                except (ValueError, OverflowError):
+                    continue  # 相机写入的占位值（如全零），尝试下一个标签
+    except Exception:
+        pass  # 非图片或文件头损坏，按无EXIF处理
+    return None
+
+
+def _capture_time_key(entry):
+    stat = entry.stat()
+    return entry.path, stat.st_size, stat.st_mtime_ns
+
+
+def _cached_capture_time(entry):
+    """读取并缓存单个条目的拍摄时间，缓存按路径、大小和修改时间失效"""
+    key = _capture_time_key(entry)
+    with _capture_time_lock:
+        if key in _capture_time_cache:
+            return _capture_time_cache[key]
+    value = read_capture_time(entry.path) if entry.name.lower().endswith(EXIF_IMAGE_EXTS) else None
+    with _capture_time_lock:
+        _capture_time_cache[key] = value
+        while len(_capture_time_cache) > CAPTURE_TIME_CACHE_SIZE:
+            del _capture_time_cache[next(iter(_capture_time_cache))]
+    return value
+
+
+def prefetch_capture_times(entries, workers=8):
+    """在线程池中预先读取一批条目的拍摄时间（文件头读取以IO等待为主，可并行）"""
+    # stat 在锁外完成：网络共享上每次都是一次往返，不能让其他线程排队等待
+    keyed = [(entry, _capture_time_key(entry)) for entry in entries if entry.is_file()]
+    with _capture_time_lock:
+        missing = [entry for entry, key in keyed if key not in _capture_time_cache]
+    if len(missing) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_cached_capture_time, missing))
+
+
+def capture_time(entry):
+    """排序用的拍摄时间：EXIF拍摄/数字化/修改时间，均无时退回文件修改时间"""
+    value = _cached_capture_time(entry) if entry.is_file() else None
+    return value if value is not None else entry.stat().st_mtime
+
+
+# 重复文件检测：先按大小分桶，只对大小相同的文件计算部分哈希，再对部分哈希相同的计算全量哈希
+DUPLICATES_DIR = "_duplicates"
+PARTIAL_HASH_BYTES = 64 * 1024  # 部分哈希读取文件首尾各64KB
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def _mmap_digest(path, size, partial):
+    """通过内存映射计算文件摘要；partial 时只读首尾两段"""
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            if partial:
+                digest.update(view[:PARTIAL_HASH_BYTES])
+                digest.update(view[max(PARTIAL_HASH_BYTES, size - PARTIAL_HASH_BYTES):])
+            else:
+                for offset in range(0, size, HASH_CHUNK_BYTES):
+                    digest.update(view[offset:offset + HASH_CHUNK_BYTES])
+        finally:
+            view.release()  # 关闭映射前必须释放视图
+    return digest.digest()
+
+
+def _refine_groups(groups, partial, executor):
+    """在线程池中计算摘要，把每组按摘要再细分，只保留仍有多个成员的组"""
+    members = [entry for group in groups for entry in group]
+
+    def digest(entry):
+        try:
+            return _mmap_digest(entry.path, entry.stat().st_size, partial)
+        except (OSError, ValueError):
+            return entry.path  # 无法读取的文件视为唯一
+
+    refined = []
+    digests = dict(zip((entry.path for entry in members), executor.map(digest, members)))
+    for group in groups:
+        buckets = {}
+        for entry in group:
+            buckets.setdefault(digests[entry.path], []).append(entry)
+        refined.extend(bucket for bucket in buckets.values() if len(bucket) > 1)
+    return refined
+
+
+def find_duplicates(entries, workers=8):
+    """查找内容完全相同的文件，返回 {保留的名称: [重复的名称, ...]}
+
+    每组中顺序最靠前的条目被保留；大小唯一的文件不会被读取，
+    不超过两段部分哈希长度的文件部分哈希即全量哈希，不再重复读取
+    """
+    by_size = {}
+    for entry in entries:
+        if entry.is_file():
+            by_size.setdefault(entry.stat().st_size, []).append(entry)
+    groups = [group for size, group in by_size.items() if len(group) > 1 and size == 0]  # 空文件无需读取
+    candidates = [group for size, group in by_size.items() if len(group) > 1 and size > 0]
+    if candidates:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            candidates = _refine_groups(candidates, True, executor)
+            large = [group for group in candidates if group[0].stat().st_size > 2 * PARTIAL_HASH_BYTES]
+            groups.extend(group for group in candidates if group[0].stat().st_size <= 2 * PARTIAL_HASH_BYTES)
+            groups.extend(_refine_groups(large, False, executor))
+    return {group[0].name: [entry.name for entry in group[1:]] for group in groups}
+
+
+def plan_duplicate_moves(directory, duplicates):
+    """为待移走的重复文件生成步骤 [(名称, '_duplicates/新名称')]，避开该目录中已有的名称"""
+    try:
+        with os.scandir(os.path.join(directory, DUPLICATES_DIR)) as entries:
+            taken = {entry.name for entry in entries}
+    except FileNotFoundError:
+        taken = set()
+    steps = []
+    for name in duplicates:
+        target = name
+        stem, ext = os.path.splitext(name)
+        counter = itertools.count(2)
+        while target in taken:
+            target = f"{stem}~{next(counter)}{ext}"
+        taken.add(target)
+        steps.append((name, f"{DUPLICATES_DIR}/{target}"))
+    return steps
+
+
+def parse_extensions(text):
+    """把 'jpg, .png gif' 解析为 ('.jpg', '.png', '.gif')，为空时返回None"""
+    exts = tuple('.' + ext.lstrip('.').lower() for ext in re.split(r'[\s,;，；]+', text) if ext.strip('.'))
+    return exts or None
+
+
+def parse_replace_rules(text):
+    """把 '旧=>新; 正则2=>新2' 解析为 [(正则, 替换)]，替换中可用 \\1 引用分组"""
+    rules = []
+    for rule in text.split(';'):
+        if not rule.strip():
+            continue
+        if '=>' not in rule:
+            raise ValueError(f"替换规则缺少 '=>'：{rule.strip()}")
+        pattern, replacement = rule.split('=>', 1)
+        rules.append((pattern.strip(), replacement.strip()))
+    return rules
+
+
+class RenameTemplate:
+    """编译后的重命名模板
+
+    模板只在构造时解析一次，得到由字面量和取值函数组成的片段列表，
+    之后对每个名称只做拼接。支持的标记：
+        {n:04}          序号（格式说明同Python format）
+        {stem} {ext}    原名称主干 / 扩展名（含点号；设置统一后缀时为该后缀）
+        {name}          原名称
+        {parent}        所在目录名
+        {mtime:%Y%m%d}  修改时间（{ctime} 为创建时间，格式说明同strftime）
+        {1} {year}      匹配正则的编号 / 命名分组
+    {{ 与 }} 表示字面量花括号。设置了匹配正则时，不匹配的条目不参与重命名和编号；
+    替换规则按顺序作用于生成的新名称
+    """
+
+    TOKEN_RE = re.compile(r'\{\{|\}\}|\{([^{}:]+)(?::([^{}]*))?\}|[{}]')
+    BUILTIN_TOKENS = ('n', 'stem', 'ext', 'name', 'parent', 'mtime', 'ctime')
+    # Python文档列出的可移植strftime指令；其余指令在不同平台上原样输出或报错
+    TIME_DIRECTIVES = set('aAwdbBmyYHIpMSzZjUWcxXGuV%')
+
+    def __init__(self, template, match=None, replacements=(), suffix=''):
+        self.source = template
+        self.match = re.compile(match) if match else None
+        self.replacements = [(re.compile(pattern), replacement) for pattern, replacement in replacements]
+        if suffix and not suffix.startswith('.'):  # 自动补全点号
+            suffix = '.' + suffix
+        self.suffix = suffix
+        self.parts = self._compile(template)
+
+    def _compile(self, template):
+        """把模板拆分为片段：字面量为字符串，标记为 (名称, 格式说明)"""
+        groups = set(self.match.groupindex) if self.match else set()
+        group_count = self.match.groups if self.match else 0
+        parts = []
+        position = 0
+        for token in self.TOKEN_RE.finditer(template):
+            if token.start() > position:
+                parts.append(template[position:token.start()])
+            position = token.end()
+            text = token.group(0)
+            if text in ('{{', '}}'):
+                parts.append(text[0])
+                continue
+            if text in ('{', '}'):
+                raise ValueError(f"模板中的花括号不成对（位置 {token.start() + 1}），字面量请写作 {{{{ 或 }}}}")
+            name, spec = token.group(1).strip(), token.group(2) or ''
+            if name.isdigit():
+                if int(name) > group_count:
+                    raise ValueError(f"模板引用了不存在的分组 {{{name}}}")
+            elif name not in self.BUILTIN_TOKENS and name not in groups:
+                raise ValueError(f"未知的模板标记 {{{name}}}")
+            # 用样例值校验格式说明，错误在编译时而不是执行中途暴露
+            sample = 1 if name == 'n' else (time.localtime() if name in ('mtime', 'ctime') else '')
+            try:
+                if name in ('mtime', 'ctime'):
+                    self._check_time_spec(spec)
+                self._format(name, spec, sample)
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"标记 {{{name}:{spec}}} 的格式无效：{str(e)}")
+            parts.append((name, spec))
+        if position < len(template):
+            parts.append(template[position:])
+        return parts
+
+    @classmethod
+    def _check_time_spec(cls, spec):
+        """拒绝未知的 % 指令（strftime会把它们原样写进文件名）"""
+        for directive in re.finditer(r'%(.?)', spec):
+            if directive.group(1) not in cls.TIME_DIRECTIVES:
+                raise ValueError(f"未知的时间格式 {directive.group(0)}")
+
+    @staticmethod
+    def _format(name, spec, value):
+        if name in ('mtime', 'ctime'):
+            return time.strftime(spec or '%Y%m%d', value)
+        return format(value, spec)
+
+    def accepts(self, name):
+        """条目是否参与重命名（未设置匹配正则时全部参与）"""
+        return self.match is None or self.match.search(name) is not None
+
+    def render(self, index, entry, parent=''):
+        """为一个条目生成新名称，entry 为os.DirEntry（时间标记使用其缓存的stat）"""
+        name = entry.name
+        if entry.is_file():
+            stem, ext = os.path.splitext(name)
+        else:
+            stem, ext = name, ''
+        match = self.match.search(name) if self.match else None
+        values = {'n': index, 'stem': stem, 'ext': self.suffix or ext, 'name': name, 'parent': parent}
+        pieces = []
+        for part in self.parts:
+            if isinstance(part, str):
+                pieces.append(part)
+                continue
+            token, spec = part
+            if token in values:
+                value = values[token]
+            elif token == 'mtime':
+                value = time.localtime(entry.stat().st_mtime)
+            elif token == 'ctime':
+                value = time.localtime(entry.stat().st_ctime)
+            else:
+                value = (match.group(int(token) if token.isdigit() else token) if match else '') or ''
+            pieces.append(self._format(token, spec, value))
+        new_name = ''.join(pieces)
+        for pattern, replacement in self.replacements:
+            new_name = pattern.sub(replacement, new_name)
+        return new_name
+
+    def build_plan(self, entries, parent=''):
+        """按排序后的条目生成 [(旧名, 新名), ...]"""
+        return [(entry.name, self.render(idx + 1, entry, parent)) for idx, entry in enumerate(entries)]
+
+    def index_pattern(self):
+        """返回匹配本模板生成的名称并取出序号的正则（分组名n），模板不含 {n} 时返回None"""
+        pieces = []
+        has_index = False
+        for part in self.parts:
+            if isinstance(part, str):
+                pieces.append(re.escape(part))
+            elif part[0] == 'n':
+                pieces.append('(?P=n)' if has_index else r'(?P<n>\d+)')
+                has_index = True
+            elif part[0] == 'ext':
+                pieces.append(re.escape(self.suffix) if self.suffix else r'(?:\.[^.]*)?')
+            else:
+                pieces.append('.*?')
+        return re.compile('^' + ''.join(pieces) + '$') if has_index else None
+
+    @classmethod
+    def legacy(cls, prefix='item', padding=3, suffix=''):
+        """与 build_rename_plan 相同的 前缀_序号 格式"""
+        escaped = prefix.replace('{', '{{').replace('}', '}}')
+        return cls(f"{escaped}_{{n:0{padding}d}}{{ext}}", suffix=suffix)
+
+
+def build_rename_plan(items, prefix='item', padding=3, suffix=''):
+    """按排序后的顺序生成完整的 旧名→新名 映射（不访问磁盘）
+
+    items 为 (名称, 是否为文件) 列表，返回 [(旧名, 新名), ...]
+    """
+    if suffix and not suffix.startswith('.'):  # 自动补全点号
+        suffix = '.' + suffix
+    plan = []
+    for idx, (old_name, is_file) in enumerate(items):
+        if suffix:
+            ext = suffix
+        else:  # 保留原后缀
+            ext = os.path.splitext(old_name)[1] if is_file else ''
+        plan.append((old_name, f"{prefix}_{idx + 1:0{padding}d}{ext}"))
+    return plan
+
+
+def resolve_rename_conflicts(plan, existing, key=str):
+    """在内存中检查冲突：目标名称重复，或被不参与重命名的条目占用
+
+    existing 为单次扫描得到的目录名称集合；key 为名称比较键（大小写不敏感的卷上为 str.casefold）。
+    返回 (可执行的 {旧名: 新名}, [(旧名, 新名, 原因)])
+    """
+    moves = {}
+    conflicts = []
+    claimed = set()
+    for old, new in plan:
+        if not new or new in ('.', '..') or '/' in new or '\\' in new:
+            conflicts.append((old, new, "目标名称无效"))
+            continue
+        if key(new) in claimed:
+            conflicts.append((old, new, "目标名称重复"))
+            continue
+        claimed.add(key(new))
+        if old != new:
+            moves[old] = new
+
+    # 目标被原地不动的条目占用：该重命名取消，其源名称也随之保持占用，依次向上传递
+    existing_keys = {key(name) for name in existing}
+    sources = {key(old) for old in moves}
+    waiting = {key(new): old for old, new in moves.items()}
+    stuck = [old for old, new in moves.items() if key(new) in existing_keys and key(new) not in sources]
+    while stuck:
+        old = stuck.pop()
+        new = moves.pop(old)
+        conflicts.append((old, new, "目标已存在"))
+        blocked = waiting.get(key(old))
+        if blocked in moves:
+            stuck.append(blocked)
+    return moves, conflicts
+
+
+def order_rename_steps(moves, existing, key=str):
+    """把 {旧名: 新名} 排成可安全顺序执行的步骤
+
+    目标空闲的直接执行；目标被其他待改名条目占用的，等对方移走后执行（链）；
+    剩下互相等待的条目构成环，借助临时名称打断。返回 [(源, 目标), ...]
+    名称按 key 比较：大小写不敏感的卷上只改大小写的条目等待自身，经临时名称完成
+    """
+    occupied = {key(name) for name in existing}
+    targets = {key(new) for new in moves.values()}
+    pending = dict(moves)
+    waiting = {key(new): old for old, new in pending.items()}  # 目标名称 → 等待它空出的源
+    ready = deque(old for old, new in pending.items() if key(new) not in occupied)
+    steps = []
+    temp_index = 0
+
+    while pending:
+        while ready:
+            old = ready.popleft()
+            new = pending.pop(old)
+            waiting.pop(key(new), None)
+            steps.append((old, new))
+            occupied.discard(key(old))
+            occupied.add(key(new))
+            waiter = waiting.get(key(old))  # 源名称空出后，等待它的条目即可执行
+            if waiter in pending:
+                ready.append(waiter)
+
+        if pending:
+            # 剩余条目都在环中：先把其中一个移到临时名称
+            old, new = next(iter(pending.items()))
+            while True:
+                temp = f"{old}.renaming-{temp_index}"
+                temp_index += 1
+                if key(temp) not in occupied and key(temp) not in targets:
+                    break
+            steps.append((old, temp))
+            occupied.discard(key(old))
+            occupied.add(key(temp))
+            del pending[old]
+            pending[temp] = new
+            waiting[key(new)] = temp
+            ready.append(waiting[key(old)])
+    return steps
+
+
+def execute_rename_steps(directory, steps, log, progress=None, progress_every=500):
+    """按顺序执行重命名步骤，返回成功到位的目标名称集合
+
+    某一步失败时，依赖它腾出名称或产生临时文件的后续步骤会被跳过，避免覆盖文件；
+    progress(已处理步数) 每隔 progress_every 步及结束时调用一次
+    """
+    completed = set()
+    blocked = set()  # 未能移走、仍占用原名称的条目
+    missing = set()  # 未能生成的目标名称
+    for index, (old, new) in enumerate(steps, 1):
+        if new in blocked or old in missing:
+            blocked.add(old)
+            missing.add(new)
+        else:
+            try:
+                os.rename(os.path.join(directory, old), os.path.join(directory, new))
+                completed.add(new)
+            except OSError as e:
+                blocked.add(old)
+                missing.add(new)
+                log("error", f"处理 {old} 失败 - {str(e)}")
+        if progress is not None and index % progress_every == 0:
+            progress(index)
+    if progress is not None and steps:
+        progress(len(steps))
+    return completed
+
+
+# 重命名日志文件路径（与超链接配置文件一样保存在程序工作目录）
+RENAME_JOURNAL_FILE = "rename_journal.jsonl"
+
+
+class RenameJournal:
+    """追加写入的重命名日志，用于撤销上次批次和崩溃恢复
+
+    每个目录的全部计划步骤在执行前写入并落盘；执行与撤销进度按批次记录，
+    多条记录共用一次fsync（组提交）。可被多个线程同时写入
+    """
+
+    def __init__(self, path=RENAME_JOURNAL_FILE):
+        self.path = path
+        self.previous_path = path + '.prev'  # 上一批次的日志，撤销完当前批次后恢复
+        self.lock = Lock()
+        self.file = None
+        self.next_block = 0
+
+    def begin(self, root):
+        """开始新批次：已有日志轮换为上一批次，不直接覆盖"""
+        if os.path.exists(self.path):
+            os.replace(self.path, self.previous_path)
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self._write({'batch': root, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}, sync=True)
+
+    def add_block(self, directory, steps):
+        """写入一个目录的全部计划步骤并立即落盘，返回块编号"""
+        with self.lock:
+            block = self.next_block
+            self.next_block += 1
+        self._write({'block': block, 'dir': os.path.abspath(directory), 'steps': steps}, sync=True)
+        return block
+
+    def mark_done(self, block, count):
+        """记录该块前count步已执行"""
+        self._write({'done': block, 'n': count}, sync=True)
+
+    def mark_undone(self, block, count):
+        """记录该块已撤销的步数（从末尾倒数）"""
+        self._write({'undone': block, 'n': count}, sync=True)
+
+    def commit(self):
+        """记录批次正常结束并关闭日志；没有任何改名的批次不保留，恢复上一批次的日志"""
+        self._write({'end': True}, sync=True)
+        self.close()
+        if self.next_block == 0:
+            self.restore_previous()
+
+    def restore_previous(self):
+        """删除当前日志，把上一批次的日志恢复为可撤销的批次"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if os.path.exists(self.previous_path):
+            os.replace(self.previous_path, self.path)
+
+    def reopen(self):
+        """以追加方式打开已有日志（撤销时记录进度）"""
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write('\n')  # 崩溃时最后一行可能不完整，另起一行
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _write(self, record, sync=False):
+        with self.lock:
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if sync:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+
+    @staticmethod
+    def load(path=RENAME_JOURNAL_FILE):
+        """读取日志，不存在时返回None"""
+        if not os.path.exists(path):
+            return None
+        state = {'root': None, 'blocks': {}, 'done': {}, 'undone': {}, 'ended': False}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时最后一行可能不完整
+                if 'block' in record:
+                    state['blocks'][record['block']] = (record['dir'], record['steps'])
+                elif 'done' in record:
+                    state['done'][record['done']] = max(state['done'].get(record['done'], 0), record['n'])
+                elif 'undone' in record:
+                    state['undone'][record['undone']] = record['n']  # 以最后一次记录为准
+                elif 'batch' in record:
+                    state['root'] = record['batch']
+                elif record.get('end'):
+                    state['ended'] = True
+        return state
+
+
+def undo_rename_journal(log, path=RENAME_JOURNAL_FILE, progress_every=500):
+    """按日志倒序撤销上次批次，返回 (撤销数, 失败数)；无日志时返回None
+
+    日志只记录处理到第几步，不区分成功与失败/跳过的步骤，
+    因此每一步都先确认新名称存在且原名称空闲才反向改名，绝不覆盖已有文件
+    """
+    state = RenameJournal.load(path)
+    if state is None:
+        return None
+    journal = RenameJournal(path)
+    journal.reopen()
+    reverted = failed = 0
+    try:
+        for block in sorted(state['blocks'], reverse=True):
+            directory, steps = state['blocks'][block]
+            already = state['undone'].get(block, 0)
+            block_failed = False
+            position = 0
+            for index in range(len(steps) - 1, -1, -1):
+                position += 1
+                if position <= already:
+                    continue
+                old, new = steps[index]
+                src = os.path.join(directory, new)
+                dst = os.path.join(directory, old)
+                if not os.path.lexists(src) or os.path.lexists(dst):
+                    continue  # 该步没有执行、执行失败或已被撤销；原名称被占用时不能覆盖
+                try:
+                    os.rename(src, dst)
+                    reverted += 1
+                except OSError as e:
+                    failed += 1
+                    block_failed = True
+                    log("error", f"撤销 {new} → {old} 失败 - {str(e)}")
+                if position % progress_every == 0 and not block_failed:
+                    journal.mark_undone(block, position)
+            # 有失败时记为0步，再次撤销会逐个检查整块
+            journal.mark_undone(block, 0 if block_failed else len(steps))
+    finally:
+        journal.close()
+    if not failed:
+        journal.restore_previous()  # 撤销完成后删除日志避免重复撤销，下次撤销再上一批次
+    return reverted, failed
+
+
+def plan_directory(directory, log, prefix='item', sort_by='name', padding=3, suffix='',
+                   kind='files', extensions=None, snapshot=None, template=None, dedupe='none'):
+    """扫描并在内存中规划单个目录，不修改磁盘
+
+    template 为 RenameTemplate 时按模板生成新名称，否则使用 前缀_序号 格式。
+    dedupe 为重复文件处理方式：none 不检测 / skip 跳过 / move 移到_duplicates / group 与保留文件同号。
+    返回 (完整映射 [(旧名, 新名)], 可执行的 {旧名: 新名}, 冲突 [(旧名, 新名, 原因)], 目录快照,
+          重复文件 [(名称, 保留的名称)])
+    """
+    # 单次扫描得到目录快照，后续排序和类型判断都不再访问磁盘
+    if snapshot is None:
+        snapshot = DirectorySnapshot(directory)
+    entries = snapshot.select(kind, extensions)
+    if template is not None:
+        entries = [entry for entry in entries if template.accepts(entry.name)]
+
+    if sort_by == 'exif':
+        prefetch_capture_times(entries)
+    try:
+        entries.sort(key=DirectorySnapshot.sort_key(sort_by))
+    except KeyError:
+        log("error", f"无效的排序方式：'{sort_by}'，使用默认名称排序")
+        entries.sort(key=DirectorySnapshot.sort_key('name'))
+
+    # 重复文件在排序之后检测，每组保留顺序最靠前的一个参与编号
+    groups = find_duplicates(entries) if dedupe != 'none' else {}
+    duplicates = [(name, keeper) for keeper, names in groups.items() for name in names]
+    if duplicates:
+        skipped = {name for name, keeper in duplicates}
+        entries = [entry for entry in entries if entry.name not in skipped]
+
+    if template is not None:
+        plan = template.build_plan(entries, os.path.basename(os.path.abspath(directory)))
+    else:
+        plan = build_rename_plan([(entry.name, entry.is_file()) for entry in entries],
+                                 prefix, padding, suffix)
+    if dedupe == 'group' and duplicates:
+        # 重复文件紧跟在保留文件之后，使用同一序号加 -2、-3 区分
+        grouped = []
+        for old, new in plan:
+            grouped.append((old, new))
+            stem, ext = os.path.splitext(new)
+            grouped.extend((name, f"{stem}-{k}{ext}") for k, name in enumerate(groups.get(old, ()), 2))
+        plan = grouped
+    moves, conflicts = resolve_rename_conflicts(plan, existing_after_dedupe(snapshot, duplicates, dedupe),
+                                                snapshot.name_key())
+    return plan, moves, conflicts, snapshot, duplicates
+
+
+def existing_after_dedupe(snapshot, duplicates, dedupe):
+    """重复文件移走后空出的名称可被新名称使用"""
+    if dedupe == 'move' and duplicates:
+        return snapshot.names.difference(name for name, keeper in duplicates)
+    return snapshot.names
+
+
+def rename_directory(directory, log, prefix='item', sort_by='name', padding=3, suffix='',
+                     kind='files', extensions=None, journal=None, snapshot=None, template=None,
+                     dedupe='none'):
+    """重命名单个目录：一次扫描 → 内存中规划 → 冲突检查 → 写入日志 → 按序执行
+
+    log 为 (消息类型, 内容) 回调，返回 (成功数, 冲突数, 失败数)；
+    已有快照时可通过 snapshot 传入，避免重复扫描
+    """
+    # 第一阶段：在内存中生成完整映射并检查冲突
+    plan, moves, conflicts, snapshot, duplicates = plan_directory(
+        directory, log, prefix, sort_by, padding, suffix, kind, extensions, snapshot, template, dedupe)
+    for old, new, reason in conflicts:
+        log("warning", f"冲突：'{new}' {reason}，跳过 {old}")
+    for name, keeper in duplicates:
+        if dedupe == 'skip':
+            log("warning", f"重复：{name} 与 {keeper} 内容相同，已跳过")
+
+    # 第二阶段：计划写入日志后按依赖顺序执行
+    # 重复文件先移走，失败时占用其名称的后续步骤会被跳过
+    steps = order_rename_steps(moves, existing_after_dedupe(snapshot, duplicates, dedupe), snapshot.name_key())
+    if dedupe == 'move' and duplicates:
+        os.makedirs(os.path.join(directory, DUPLICATES_DIR), exist_ok=True)
+        dup_steps = plan_duplicate_moves(directory, [name for name, keeper in duplicates])
+        steps = dup_steps + steps
+        moves = {**dict(dup_steps), **moves}
+    progress = None
+    if journal is not None and steps:
+        block = journal.add_block(directory, steps)
+        progress = lambda count: journal.mark_done(block, count)
+    completed = execute_rename_steps(directory, steps, log, progress)
+    renamed = 0
+    for old, new in moves.items():
+        if new in completed:
+            renamed += 1
+            log("success", f"{old} → {new}")
+    return renamed, len(conflicts), len(moves) - renamed
+
+
+def _scan_tree_node(directory, task):
+    """目录树遍历的单个任务：扫描目录 → 执行task → 返回 (子目录列表, 结果)"""
+    snapshot = DirectorySnapshot(directory)
+    return snapshot.subdirectories(), task(directory, snapshot)
+
+
+def walk_tree_parallel(root, task, workers=4):
+    """在线程池中并发遍历目录树，每个目录调用 task(目录, 快照)
+
+    子目录在父目录扫描完成后立即提交，扫描与处理的等待时间相互重叠；
+    workers 限制同时访问的目录数，避免网络共享负载过高。
+    按完成顺序产出 (目录, 结果, 异常)，异常为None表示成功
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = {executor.submit(_scan_tree_node, root, task): root}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directory = pending.pop(future)
+                try:
+                    subdirs, result = future.result()
+                except OSError as e:
+                    yield directory, None, e
+                    continue
+                for subdir in subdirs:
+                    pending[executor.submit(_scan_tree_node, subdir, task)] = subdir
+                yield directory, result, None
+
+
+def rename_tree(root, log, workers=4, journal=None, **options):
+    """递归重命名：每个目录内的文件独立编号，多个目录在线程池中并发处理
+
+    只重命名文件（目录名保持不变，遍历过程中路径始终有效），
+    逐个文件的成功消息不输出，改为每个目录一行汇总。
+    返回 (目录数, 成功数, 冲突数, 失败数)
+    """
+    options = dict(options, kind='files', journal=journal)
+
+    def quiet_log(msg_type, text):
+        if msg_type != "success":
+            log(msg_type, text)
+
+    def task(directory, snapshot):
+        return rename_directory(directory, quiet_log, snapshot=snapshot, **options)
+
+    directories = renamed = conflicts = failed = 0
+    for directory, counts, error in walk_tree_parallel(root, task, workers):
+        label = os.path.relpath(directory, root)
+        if error is not None:
+            log("error", f"[{label}] 无法处理目录 - {str(error)}")
+            continue
+        dir_renamed, dir_conflicts, dir_failed = counts
+        directories += 1
+        renamed += dir_renamed
+        conflicts += dir_conflicts
+        failed += dir_failed
+        if dir_renamed or dir_conflicts or dir_failed:
+            msg_type = "success" if not (dir_conflicts or dir_failed) else "warning"
+            log(msg_type, f"[{label}] 重命名 {dir_renamed} 个，冲突 {dir_conflicts} 个，失败 {dir_failed} 个")
+    return directories, renamed, conflicts, failed
+
+
+def preview_rename(directory, log, recursive=False, workers=4, **options):
+    """试运行：只规划不执行，返回预览行列表 [(目录, 旧名, 新名, 冲突原因或None)]
+
+    行数据只保存字符串元组，由预览窗口按需绘制，不为每行创建界面对象
+    """
+    if recursive:
+        options = dict(options, kind='files')
+
+    def task(path, snapshot):
+        plan, moves, conflicts, _, duplicates = plan_directory(path, log, snapshot=snapshot, **options)
+        reasons = {old: reason for old, new, reason in conflicts}
+        label = os.path.relpath(path, directory)
+        rows = [(label, old, new, reasons.get(old)) for old, new in plan]
+        dedupe = options.get('dedupe')
+        if dedupe == 'skip':
+            rows.extend((label, name, name, f"与 {keeper} 重复，跳过") for name, keeper in duplicates)
+        elif dedupe == 'move':
+            steps = plan_duplicate_moves(path, [name for name, keeper in duplicates])
+            rows.extend((label, old, new, None) for old, new in steps)
+        return rows
+
+    if not recursive:
+        return task(directory, DirectorySnapshot(directory))
+    rows = []
+    for path, dir_rows, error in walk_tree_parallel(directory, task, workers):
+        if error is not None:
+            log("error", f"[{os.path.relpath(path, directory)}] 无法处理目录 - {str(error)}")
+        else:
+            rows.extend(dir_rows)
+    return rows
+
+
+# 监视文件夹：只处理新到达的文件，不重新扫描整个目录
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len，其后为len字节的文件名
+
+
+class InotifyWatcher:
+    """Linux inotify 监视（通过ctypes调用libc），只返回新出现或写完的文件名
+
+    与轮询方式一样维护已知名称集合（随事件增删），事件队列溢出时全量扫描一次，
+    只返回不在集合中的名称，开始监视前已存在的文件不会被当作新文件
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.known = set(os.listdir(directory))
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MOVED_FROM | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, "inotify_add_watch 失败")
+
+    def poll(self, timeout):
+        """等待至多timeout秒，返回期间有事件的文件名集合"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出：退回一次全量扫描，与已知名称比较找出新文件
+                current = set(os.listdir(self.directory))
+                names.update(current - self.known)
+                self.known = current
+                return names
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if not name:
+                continue
+            name = os.fsdecode(name)
+            if mask & (IN_MOVED_FROM | IN_DELETE):
+                self.known.discard(name)
+                names.discard(name)
+            elif name not in self.known:  # 已有文件被改写不算新到达
+                self.known.add(name)
+                names.add(name)
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """非Linux平台或inotify不可用时的轮询监视：定时比较目录名称集合"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.known = set(os.listdir(directory))
+
+    def poll(self, timeout):
+        time.sleep(timeout)
+        current = set(os.listdir(self.directory))
+        new_names = current - self.known
+        self.known = current
+        return new_names
+
+    def close(self):
+        pass
+
+
+def create_watcher(directory):
+    """优先使用inotify，失败时退回轮询，返回 (监视器, 方式说明)"""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory), "inotify"
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(directory), "轮询"
+
+
+class WatchedFile:
+    """新到达文件的最小条目对象，提供模板渲染所需的 DirEntry 接口"""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._stat = None
+
+    def is_file(self):
+        return os.path.isfile(self.path)
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def highest_index(directory, pattern):
+    """启动时扫描一次目录，返回已按格式命名的最大序号"""
+    if pattern is None:
+        return 0
+    highest = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = pattern.match(entry.name)
+            if match:
+                highest = max(highest, int(match.group('n')))
+    return highest
+
+
+def watch_directory(directory, log, stop_event, template, extensions=None, journal=None,
+                    settle=2.0, interval=0.5):
+    """监视目录，把新到达的文件按模板从现有最大序号之后继续编号，直到 stop_event 被设置
+
+    文件在 settle 秒内大小和修改时间都不再变化才视为写入完成（防抖）；
+    本函数自己改出的名称以及已符合命名格式的名称不会再次处理。返回重命名数
+    """
+    watcher, method = create_watcher(directory)
+    pattern = template.index_pattern()
+    index = highest_index(directory, pattern)
+    parent = os.path.basename(os.path.abspath(directory))
+    log("success", f"开始监视（{method}），从序号 {index + 1} 继续")
+    pending = {}  # 文件名 → (截止时间, 大小, 修改时间)
+    produced = set()  # 本函数改出的名称（替换规则可能使其不符合序号格式）
+    renamed = 0
+    try:
+        while not stop_event.is_set():
+            timeout = interval
+            if pending:
+                timeout = max(0.05, min(interval, min(item[0] for item in pending.values()) - time.monotonic()))
+            for name in watcher.poll(timeout):
+                if name in produced:
+                    produced.discard(name)
+                    continue
+                match = pattern.match(name) if pattern else None
+                if match:  # 本程序改出的名称或已按格式命名的文件
+                    index = max(index, int(match.group('n')))
+                    continue
+                if name == DUPLICATES_DIR or (extensions and not name.lower().endswith(extensions)):
+                    continue
+                if not template.accepts(name):
+                    continue
+                pending[name] = (time.monotonic() + settle, None, None)
+
+            now = time.monotonic()
+            ready = []
+            for name, (deadline, size, mtime) in list(pending.items()):
+                if deadline > now:
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    del pending[name]  # 已被移走或删除
+                    continue
+                if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                    pending[name] = (now + settle, stat.st_size, stat.st_mtime_ns)  # 仍在写入
+                    continue
+                del pending[name]
+                ready.append(name)
+
+            planned = []
+            for name in sorted(ready, key=str.lower):
+                entry = WatchedFile(directory, name)
+                if not entry.is_file():
+                    continue
+                index += 1
+                planned.append((entry, template.render(index, entry, parent)))
+            if not planned:
+                continue
+
+            # 同一轮就绪的文件共用一个日志块：执行前、执行后各落盘一次（组提交），而不是每个文件两次
+            block = None
+            if journal is not None:
+                block = journal.add_block(directory, [(entry.name, new_name) for entry, new_name in planned])
+            for entry, new_name in planned:
+                if os.path.lexists(os.path.join(directory, new_name)):
+                    log("warning", f"冲突：'{new_name}' 目标已存在，跳过 {entry.name}")
+                    continue
+                try:
+                    os.rename(entry.path, os.path.join(directory, new_name))
+                except OSError as e:
+                    log("error", f"处理 {entry.name} 失败 - {str(e)}")
+                    continue
+                produced.add(new_name)
+                renamed += 1
+                log("success", f"{entry.name} → {new_name}")
+            if block is not None:
+                journal.mark_done(block, len(planned))
+    finally:
+        watcher.close()
+    return renamed
+
+
+class RenamePreviewWindow:
+    """虚拟化的重命名预览列表
+
+    只为可见区域的几十行创建画布文本，滚动时重绘；
+    筛选结果保存为行号列表（无筛选时直接用range），50万行与50行的界面开销相同
+    """
+
+    COLUMNS = (("目录", 0.0), ("原名称", 0.18), ("新名称", 0.50), ("状态", 0.82))
+    ROW_HEIGHT = 20
+
+    def __init__(self, parent, rows):
+        self.rows = rows
+        self.view = range(len(rows))  # 当前筛选结果（行号序列）
+        self.conflict_positions = []  # 冲突行在view中的位置
+        self.first = 0  # 可见区域第一行在view中的位置
+        self.selected = None  # 高亮行在view中的位置
+        self.filter_job = None
+
+        self.win = tk.Toplevel(parent)
+        self.win.title(f"重命名预览（共 {len(rows)} 项）")
+        self.win.geometry("900x560")
+
+        # ----- 工具栏 -----
+        toolbar = ttk.Frame(self.win)
+        toolbar.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(toolbar, text="筛选:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', lambda *args: self.schedule_filter())
+        ttk.Entry(toolbar, textvariable=self.filter_var, width=30).pack(side=tk.LEFT, padx=5)
+        self.conflicts_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(toolbar, text="仅显示冲突", variable=self.conflicts_only,
+                        command=self.apply_filter).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="⤓ 下一个冲突", command=self.next_conflict).pack(side=tk.LEFT, padx=5)
+        self.count_label = ttk.Label(toolbar, foreground=COLORS['text'])
+        self.count_label.pack(side=tk.RIGHT)
+
+        # ----- 表头与列表 -----
+        self.header = tk.Canvas(self.win, height=self.ROW_HEIGHT + 4, bg=COLORS['background'],
+                                highlightthickness=0)
+        self.header.pack(fill=tk.X, padx=10)
+        body = ttk.Frame(self.win)
+        body.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.canvas = tk.Canvas(body, bg='white', highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind('<Configure>', lambda event: self.redraw())
+        self.canvas.bind('<MouseWheel>', self.on_mousewheel)  # Windows/macOS
+        self.canvas.bind('<Button-4>', lambda event: self.scroll_to(self.first - 3))  # Linux
+        self.canvas.bind('<Button-5>', lambda event: self.scroll_to(self.first + 3))
+        self.canvas.bind('<Button-1>', self.on_click)
+        self.win.bind('<Prior>', lambda event: self.scroll_to(self.first - self.visible_rows()))
+        self.win.bind('<Next>', lambda event: self.scroll_to(self.first + self.visible_rows()))
+
+        self.apply_filter()
+
+    # ----- 筛选 -----
+    def schedule_filter(self):
+        """输入停止300毫秒后再筛选，避免每次按键都遍历全部行"""
+        if self.filter_job is not None:
+            self.win.after_cancel(self.filter_job)
+        self.filter_job = self.win.after(300, self.apply_filter)
+
+    def apply_filter(self):
+        """按关键字（匹配目录、原名称或新名称，不区分大小写）和冲突状态筛选"""
+        self.filter_job = None
+        keyword = self.filter_var.get().strip().lower()
+        conflicts_only = self.conflicts_only.get()
+        rows = self.rows
+        if not keyword and not conflicts_only:
+            self.view = range(len(rows))
+        else:
+            self.view = [index for index, (label, old, new, reason) in enumerate(rows)
+                         if (not conflicts_only or reason)
+                         and (not keyword or keyword in old.lower() or keyword in new.lower()
+                              or keyword in label.lower())]
+        self.conflict_positions = [pos for pos, index in enumerate(self.view) if rows[index][3]]
+        self.count_label.config(text=f"显示 {len(self.view)} / {len(rows)} 项，"
+                                     f"冲突 {len(self.conflict_positions)} 项")
+        self.first = 0
+        self.selected = None
+        self.redraw()
+
+    # ----- 滚动 -----
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.ROW_HEIGHT)
+
+    def scroll_to(self, first):
+        self.first = max(0, min(first, len(self.view) - self.visible_rows()))
+        self.redraw()
+
+    def on_scrollbar(self, action, value, unit=None):
+        """把滚动条操作换算为行号（画布本身不保存全部内容）"""
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(value) * len(self.view)))
+        elif action == tk.SCROLL:
+            step = self.visible_rows() if unit == tk.PAGES else 1
+            self.scroll_to(self.first + int(value) * step)
+
+    def on_mousewheel(self, event):
+        self.scroll_to(self.first - (event.delta // 120 or (1 if event.delta > 0 else -1)) * 3)
+
+    def on_click(self, event):
+        position = self.first + event.y // self.ROW_HEIGHT
+        if position < len(self.view):
+            self.selected = position
+            self.redraw()
+
+    def next_conflict(self):
+        """跳到当前高亮行（或可见区域顶部）之后的下一个冲突，到末尾后从头开始"""
+        if not self.conflict_positions:
+            return
+        current = self.selected if self.selected is not None else self.first - 1
+        index = bisect.bisect_right(self.conflict_positions, current)
+        self.selected = self.conflict_positions[index % len(self.conflict_positions)]
+        if not self.first <= self.selected < self.first + self.visible_rows():
+            self.first = max(0, self.selected - self.visible_rows() // 3)
+        self.scroll_to(self.first)
+
+    # ----- 绘制 -----
+    def column_width(self, column, width):
+        end = self.COLUMNS[column + 1][1] if column + 1 < len(self.COLUMNS) else 1.0
+        return int((end - self.COLUMNS[column][1]) * width) - 8
+
+    @staticmethod
+    def elide(text, pixels, char_width=7):
+        """按估算字宽截断过长文本，避免覆盖相邻列"""
+        limit = max(4, pixels // char_width)
+        return text if len(text) <= limit else text[:limit - 1] + '…'
+
+    def redraw(self):
+        """只绘制可见区域的行，并同步滚动条位置"""
+        width = self.canvas.winfo_width()
+        self.header.delete(tk.ALL)
+        for title, offset in self.COLUMNS:
+            self.header.create_text(int(offset * width) + 4, self.ROW_HEIGHT // 2 + 2, text=title,
+                                    anchor=tk.W, font=('微软雅黑', 9, 'bold'))
+
+        canvas = self.canvas
+        canvas.delete(tk.ALL)
+        total = len(self.view)
+        count = self.visible_rows()
+        last = min(total, self.first + count + 1)
+        for line, position in enumerate(range(self.first, last)):
+            label, old, new, reason = self.rows[self.view[position]]
+            top = line * self.ROW_HEIGHT
+            if position == self.selected:
+                canvas.create_rectangle(0, top, width, top + self.ROW_HEIGHT, fill='#dbe9f9', width=0)
+            if reason:
+                color, status = COLORS['danger'], f"冲突：{reason}"
+            elif old == new:
+                color, status = COLORS['text'], "不变"
+            else:
+                color, status = COLORS['success'], "重命名"
+            for column, text in enumerate((label, old, new, status)):
+                x = int(self.COLUMNS[column][1] * width)
+                canvas.create_text(x + 4, top + self.ROW_HEIGHT // 2,
+                                   text=self.elide(text, self.column_width(column, width)),
+                                   anchor=tk.W, fill=color if column == 3 else 'black')
+
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + count) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+
 # ==================== 文件重命名模块 ====================
 class RenameModule(BaseModule):
     """批量文件重命名功能（支持修改后缀）"""
 
     def __init__(self, parent):
+        self.watch_stop = None  # 监视模式的停止信号
         super().__init__(parent)
+        self.check_unfinished_batch()
+
+    def check_unfinished_batch(self):
+        """启动时检查上次批次是否因崩溃未完成"""
+        try:
+            state = RenameJournal.load()
+        except Exception:
+            return
+        if state is not None and not state['ended']:
+            self.log_queue.put(("warning", f"检测到未完成的重命名批次（{state['root']}），"
+                                           f"可点击【撤销上次批次】恢复原文件名"))
 
     def create_widgets(self):
         """构建界面组件"""
@@ -118,8 +1400,10 @@ class RenameModule(BaseModule):
         help_text = """使用说明：
 1. 选择需要批量重命名的文件夹
 2. 设置文件名前缀、排序方式、序号位数
-3. 【新增】可设置统一文件后缀（如：.txt）
-4. 点击【开始重命名】执行操作"""
+3. 【新增】可设置统一文件后缀（如：.txt），或填写命名模板（填写后不再使用前缀和序号位数）
+4. 勾选【递归子目录】时，每个子目录内的文件独立编号
+5. 点击【预览】查看完整计划和冲突，确认后点击【开始重命名】，可通过【撤销上次批次】恢复
+6. 【监视文件夹】持续为新到达的文件从现有最大序号之后继续编号，再次点击停止"""
         ttk.Label(self.frame, text=help_text, foreground=COLORS['text']).pack(pady=5, anchor="w")
 
         # ----- 目录选择部分 -----
@@ -144,7 +1428,7 @@ class RenameModule(BaseModule):
         # 排序方式
         ttk.Label(param_frame, text="排序方式:").grid(row=0, column=2, padx=5)
         self.sort_combo = ttk.Combobox(param_frame,
-                                       values=["名称", "修改时间", "创建时间"],
+                                       values=["名称", "修改时间", "创建时间", "拍摄时间(EXIF)"],
                                        state="readonly")
         self.sort_combo.current(0)  # 默认选择第一个
         self.sort_combo.grid(row=0, column=3, padx=5)
@@ -163,6 +1447,51 @@ class RenameModule(BaseModule):
         self.suffix_entry = ttk.Entry(param_frame, width=8)
         self.suffix_entry.grid(row=0, column=7, padx=5)
 
+        # 重命名对象（是否包含子文件夹）
+        ttk.Label(param_frame, text="对象:").grid(row=1, column=0, padx=5, pady=3)
+        self.kind_combo = ttk.Combobox(param_frame,
+                                       values=["仅文件", "文件和文件夹", "仅文件夹"],
+                                       state="readonly")
+        self.kind_combo.current(0)
+        self.kind_combo.grid(row=1, column=1, sticky=tk.W, padx=5)
+
+        # 扩展名筛选
+        ttk.Label(param_frame, text="扩展名筛选:").grid(row=1, column=2, padx=5)
+        self.ext_filter_entry = ttk.Entry(param_frame)
+        self.ext_filter_entry.grid(row=1, column=3, padx=5)
+        ttk.Label(param_frame, text="（如：jpg,png，留空为全部）").grid(row=1, column=4, columnspan=4, sticky=tk.W)
+
+        # 递归模式（每个子目录独立编号，多目录并发）
+        self.recursive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(param_frame, text="递归子目录（仅文件）",
+                        variable=self.recursive_var).grid(row=2, column=0, columnspan=2, sticky=tk.W, padx=5, pady=3)
+        ttk.Label(param_frame, text="并发目录数:").grid(row=2, column=2, padx=5)
+        self.dir_workers_spin = ttk.Spinbox(param_frame, from_=1, to=32, width=5)
+        self.dir_workers_spin.set(4)  # 网络共享上不宜过高
+        self.dir_workers_spin.grid(row=2, column=3, sticky=tk.W, padx=5)
+
+        # 重复文件处理（按大小分桶后哈希比较内容）
+        ttk.Label(param_frame, text="重复文件:").grid(row=2, column=4, padx=5)
+        self.dedupe_combo = ttk.Combobox(param_frame,
+                                         values=["不检测", "跳过", f"移到{DUPLICATES_DIR}", "编号为一组"],
+                                         state="readonly", width=14)
+        self.dedupe_combo.current(0)
+        self.dedupe_combo.grid(row=2, column=5, columnspan=2, sticky=tk.W, padx=5)
+
+        # 命名模板（留空时使用 前缀_序号 格式）
+        ttk.Label(param_frame, text="命名模板:").grid(row=3, column=0, padx=5, pady=3)
+        self.template_entry = ttk.Entry(param_frame, width=30)
+        self.template_entry.grid(row=3, column=1, columnspan=2, sticky=tk.EW, padx=5)
+        ttk.Label(param_frame, text="匹配正则:").grid(row=3, column=3, padx=5)
+        self.match_entry = ttk.Entry(param_frame)
+        self.match_entry.grid(row=3, column=4, columnspan=2, sticky=tk.EW, padx=5)
+        ttk.Label(param_frame, text="替换规则:").grid(row=3, column=6, padx=5)
+        self.replace_entry = ttk.Entry(param_frame, width=16)
+        self.replace_entry.grid(row=3, column=7, padx=5)
+        ttk.Label(param_frame, text="（模板如：{parent}_{n:03}_{mtime:%Y%m%d}{ext}，标记还有 {stem} {name} {1}；"
+                                    "替换规则如：旧=>新; 正则=>新）",
+                  foreground=COLORS['text']).grid(row=4, column=0, columnspan=8, sticky=tk.W, padx=5)
+
         # ----- 操作按钮 -----
         btn_frame = ttk.Frame(self.frame)
         btn_frame.pack(pady=10)
@@ -171,6 +1500,18 @@ class RenameModule(BaseModule):
                                     style='Primary.TButton',
                                     command=self.start_rename)
         self.start_btn.pack(side=tk.LEFT, padx=5)
+        self.preview_btn = ttk.Button(btn_frame,
+                                      text="👁 预览",
+                                      command=self.start_preview)
+        self.preview_btn.pack(side=tk.LEFT, padx=5)
+        self.watch_btn = ttk.Button(btn_frame,
+                                    text="👀 监视文件夹",
+                                    command=self.toggle_watch)
+        self.watch_btn.pack(side=tk.LEFT, padx=5)
+        self.undo_btn = ttk.Button(btn_frame,
+                                   text="↩ 撤销上次批次",
+                                   command=self.start_undo)
+        self.undo_btn.pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="🗑️ 清空日志", command=self.clear_log).pack(side=tk.LEFT)
 
         # ----- 日志区域 -----
@@ -195,94 +1536,599 @@ class RenameModule(BaseModule):
             self.dir_entry.delete(0, tk.END)
             self.dir_entry.insert(0, directory)
 
+    def collect_params(self):
+        """校验目录并收集界面参数，目录无效时返回None"""
+        directory = self.dir_entry.get()
+        if not os.path.isdir(directory):
+            messagebox.showerror("错误", "无效的目录路径")
+            return None
+        template = None
+        match = self.match_entry.get().strip()
+        rules = self.replace_entry.get()
+        if self.template_entry.get().strip() or match or rules.strip():
+            try:
+                # 模板只在这里编译一次，之后用于全部目录和名称
+                template = RenameTemplate(self.template_entry.get().strip() or '{stem}{ext}', match,
+                                          parse_replace_rules(rules), self.suffix_entry.get().strip())
+            except (ValueError, re.error) as e:
+                messagebox.showerror("模板错误", str(e))
+                return None
+        return {
+            'directory': directory,
+            'prefix': self.prefix_entry.get(),
+            'sort_by': ['name', 'modified', 'created', 'exif'][self.sort_combo.current()],
+            'padding': int(self.digits_spin.get()),
+            'suffix': self.suffix_entry.get().strip(),  # 新增后缀参数
+            'kind': ['files', 'all', 'dirs'][self.kind_combo.current()],
+            'extensions': parse_extensions(self.ext_filter_entry.get()),
+            'recursive': self.recursive_var.get(),
+            'workers': int(self.dir_workers_spin.get()),
+            'template': template,
+            'dedupe': ['none', 'skip', 'move', 'group'][self.dedupe_combo.current()]
+        }
+
     def start_rename(self):
         """启动重命名任务"""
         if self.running:
             messagebox.showwarning("操作进行中", "当前已有任务正在运行，请稍候")
             return
 
-        directory = self.dir_entry.get()
-        if not os.path.isdir(directory):
-            messagebox.showerror("错误", "无效的目录路径")
+        # 收集参数
+        params = self.collect_params()
+        if params is None:
             return
 
         self.running = True
         self.start_btn.config(text="⏳ 运行中...", state=tk.DISABLED)
 
-        # 收集参数
-        params = {
-            'directory': directory,
-            'prefix': self.prefix_entry.get(),
-            'sort_by': ['name', 'modified', 'created'][self.sort_combo.current()],
-            'padding': int(self.digits_spin.get()),
-            'suffix': self.suffix_entry.get().strip()  # 新增后缀参数
-        }
-
         # 启动后台线程
         Thread(target=self.batch_rename, kwargs=params, daemon=True).start()
 
-    def batch_rename(self, directory, prefix='item', sort_by='name', padding=3, suffix=''):
-        """执行批量重命名核心逻辑（新增后缀处理）"""
-        try:
-            # 获取目录下所有条目（排除.和..）
-            items = [item for item in os.listdir(directory)
-                     if item not in ('.', '..')]
-
-            # 定义排序方式对应的键函数
-            sort_keys = {
-                'name': lambda x: x.lower(),  # 按名称排序（不区分大小写）
-                'modified': lambda x: os.path.getmtime(os.path.join(directory, x)),
-                'created': lambda x: os.path.getctime(os.path.join(directory, x))
-            }
+    def start_preview(self):
+        """启动试运行：后台规划，完成后打开预览窗口"""
+        if self.running:
+            messagebox.showwarning("操作进行中", "当前已有任务正在运行，请稍候")
+            return
+        params = self.collect_params()
+        if params is None:
+            return
+        self.running = True
+        self.start_btn.config(text="⏳ 运行中...", state=tk.DISABLED)
+        self.log_queue.put(("warning", "正在生成预览（不会修改任何文件）..."))
+        Thread(target=self.preview_plan, kwargs=params, daemon=True).start()
 
-            try:
-                items_sorted = sorted(items, key=sort_keys[sort_by])
-            except KeyError:
-                self.log_queue.put(("error", f"无效的排序方式：'{sort_by}'，使用默认名称排序"))
-                items_sorted = sorted(items, key=sort_keys['name'])
-
-            # 倒序处理避免覆盖问题
-            for idx in reversed(range(len(items_sorted))):
-                old_name = items_sorted[idx]
-                old_path = os.path.join(directory, old_name)
-
-                # 处理后缀逻辑
-                if suffix:  # 如果用户输入了后缀
-                    if not suffix.startswith('.'):  # 自动补全点号
-                        suffix = '.' + suffix
-                    ext = suffix
-                else:  # 保留原后缀
-                    ext = os.path.splitext(old_name)[1] if os.path.isfile(old_path) else ''
-
-                # ==== 修正后的关键代码 ====
-                new_name = f"{prefix}_{idx + 1:0{padding}d}{ext}"
-                # ========================
-
-                new_path = os.path.join(directory, new_name)
-
-                if old_path == new_path:
-                    continue  # 无需重命名
-
-                if os.path.exists(new_path):
-                    self.log_queue.put(("warning", f"冲突：'{new_name}' 已存在，跳过"))
-                    continue
+    def preview_plan(self, directory, **options):
+        """在后台计算完整计划，通过after交给界面线程显示"""
+        try:
+            rows = preview_rename(directory, lambda msg_type, text: self.log_queue.put((msg_type, text)),
+                                  **options)
+            conflicts = sum(1 for row in rows if row[3])
+            self.log_queue.put(("success", f"预览完成：共 {len(rows)} 项，冲突 {conflicts} 项"))
+            self.frame.after(0, lambda: RenamePreviewWindow(self.frame, rows))
+        except Exception as e:
+            self.log_queue.put(("error", f"生成预览失败：{str(e)}"))
+        finally:
+            self.finish_task()
+
+    def batch_rename(self, directory, prefix='item', sort_by='name', padding=3, suffix='',
+                     kind='files', extensions=None, recursive=False, workers=4, template=None,
+                     dedupe='none'):
+        """执行批量重命名（先规划完整映射并写入日志，再按依赖顺序执行）"""
+        journal = RenameJournal()
+        log = lambda msg_type, text: self.log_queue.put((msg_type, text))
+        try:
+            journal.begin(os.path.abspath(directory))
+            if recursive:
+                if kind != 'files':
+                    log("warning", "递归模式仅重命名文件，已忽略文件夹选项")
+                directories, renamed, conflicts, failed = rename_tree(
+                    directory, log, workers, journal, prefix=prefix, sort_by=sort_by,
+                    padding=padding, suffix=suffix, extensions=extensions, template=template,
+                    dedupe=dedupe)
+                journal.commit()
+                self.log_queue.put(("success", f"完成：处理 {directories} 个目录，重命名 {renamed} 个，"
+                                               f"冲突 {conflicts} 个，失败 {failed} 个"))
+            else:
+                renamed, conflicts, failed = rename_directory(
+                    directory, log, prefix, sort_by, padding, suffix, kind, extensions, journal,
+                    template=template, dedupe=dedupe)
+                journal.commit()
+                self.log_queue.put(("success", f"完成：重命名 {renamed} 个，冲突 {conflicts} 个，失败 {failed} 个"))
+        except Exception as e:
+            self.log_queue.put(("error", f"发生未预期错误：{str(e)}"))
+        finally:
+            journal.close()
+            self.finish_task()
+
+    def toggle_watch(self):
+        """开始或停止监视文件夹"""
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            self.watch_btn.config(text="⏳ 正在停止...", state=tk.DISABLED)
+            return
+        if self.running:
+            messagebox.showwarning("操作进行中", "当前已有任务正在运行，请稍候")
+            return
+        params = self.collect_params()
+        if params is None:
+            return
+        template = params['template'] or RenameTemplate.legacy(params['prefix'], params['padding'],
+                                                                params['suffix'])
+        self.running = True
+        self.watch_stop = Event()
+        self.start_btn.config(text="⏳ 监视中...", state=tk.DISABLED)
+        self.watch_btn.config(text="⏹ 停止监视")
+        Thread(target=self.watch_folder, args=(params['directory'], template, params['extensions']),
+               daemon=True).start()
+
+    def watch_folder(self, directory, template, extensions):
+        """后台监视线程：每个新文件单独写入日志，停止后可整体撤销"""
+        journal = RenameJournal()
+        try:
+            journal.begin(os.path.abspath(directory))
+            renamed = watch_directory(directory, lambda msg_type, text: self.log_queue.put((msg_type, text)),
+                                      self.watch_stop, template, extensions, journal)
+            journal.commit()
+            self.log_queue.put(("success", f"已停止监视：共重命名 {renamed} 个"))
+        except Exception as e:
+            self.log_queue.put(("error", f"监视失败：{str(e)}"))
+        finally:
+            journal.close()
+            self.watch_stop = None
+            self.frame.after(100, lambda: self.watch_btn.config(text="👀 监视文件夹", state=tk.NORMAL))
+            self.finish_task()
 
-                try:
-                    os.rename(old_path, new_path)
-                    self.log_queue.put(("success", f"{old_name} → {new_name}"))
-                except Exception as e:
-                    self.log_queue.put(("error", f"处理 {old_name} 失败 - {str(e)}"))
+    def start_undo(self):
+        """启动撤销任务"""
+        if self.running:
+            messagebox.showwarning("操作进行中", "当前已有任务正在运行，请稍候")
+            return
+        if not os.path.exists(RENAME_JOURNAL_FILE):
+            messagebox.showinfo("提示", "没有可撤销的重命名批次")
+            return
+        if not messagebox.askyesno("确认", "确定撤销上次重命名批次吗？"):
+            return
+        self.running = True
+        self.start_btn.config(text="⏳ 运行中...", state=tk.DISABLED)
+        Thread(target=self.undo_last_batch, daemon=True).start()
 
+    def undo_last_batch(self):
+        """按日志倒序恢复上次批次的原文件名"""
+        try:
+            result = undo_rename_journal(lambda msg_type, text: self.log_queue.put((msg_type, text)))
+            if result is None:
+                self.log_queue.put(("warning", "没有可撤销的重命名批次"))
+            else:
+                reverted, failed = result
+                self.log_queue.put(("success", f"撤销完成：恢复 {reverted} 个，失败 {failed} 个"))
         except Exception as e:
-            self.log_queue.put(("error", f"发生未预期错误：{str(e)}"))
+            self.log_queue.put(("error", f"撤销失败：{str(e)}"))
         finally:
-            self.log_queue.put(("end", ""))  # 结束标志
-            self.running = False
-            # 恢复按钮状态
-            self.frame.after(100, lambda: self.start_btn.config(
-                text="▶ 开始重命名",
-                state=tk.NORMAL
-            ))
+            self.finish_task()
+
+    def finish_task(self):
+        """后台任务结束：发送结束标志并恢复按钮状态"""
+        self.log_queue.put(("end", ""))  # 结束标志
+        self.running = False
+        # 恢复按钮状态
+        self.frame.after(100, lambda: self.start_btn.config(
+            text="▶ 开始重命名",
+            state=tk.NORMAL
+        ))
+
+
+# ==================== 图片转换核心（可在子进程中运行） ====================
+# 支持的图片后缀（小写，含点号）
+SUPPORTED_IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp', '.ico')
+
+
+def iter_image_files(folder, onerror=None):
+    """基于os.scandir递归遍历文件夹，边发现边产出支持的图片路径"""
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                subdirs = []
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(SUPPORTED_IMAGE_EXTS):
+                        yield entry.path
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+        # 逆序入栈，保持子目录按遍历顺序处理
+        stack.extend(reversed(subdirs))
+
+
+# JPEG草稿解码后至少保留目标尺寸的倍数，保证最终LANCZOS缩放有足够像素
+DRAFT_OVERSAMPLE = 2
+
+
+def conversion_target_size(options):
+    """根据转换参数计算输出的最大边界尺寸，不缩放时返回None"""
+    target_size = None
+    if options['compress']:
+        target_size = (options['max_size'], options['max_size'])
+    ico_sizes = options.get('ico_sizes')
+    if ico_sizes:
+        edge = max(ico_sizes) if target_size is None else min(target_size[0], max(ico_sizes))
+        target_size = (edge, edge)
+    return target_size
+
+
+def estimate_decoded_bytes(input_path, options):
+    """只读取文件头，估算解码后的像素字节数（已考虑JPEG草稿解码）"""
+    with Image.open(input_path) as img:
+        target_size = conversion_target_size(options)
+        if target_size:
+            apply_jpeg_draft(img, target_size)  # 仅调整解码配置，不解码像素
+        width, height = img.size
+        return width * height * len(img.getbands())
+
+
+class PixelBudget:
+    """在途解码像素的内存预算（由调度线程登记和释放）
+
+    单个文件超过整个预算时，等其他任务全部完成后单独放行，避免任务卡死
+    """
+
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self.used = 0
+
+    def fits(self, nbytes):
+        """判断当前能否放行指定字节数的任务"""
+        return self.used == 0 or self.used + nbytes <= self.limit
+
+    def acquire(self, nbytes):
+        """登记即将提交的任务"""
+        self.used += nbytes
+
+    def release(self, nbytes):
+        """任务完成后归还预算"""
+        self.used -= nbytes
+
+
+def apply_jpeg_draft(img, target_size):
+    """目标尺寸远小于原图时启用JPEG的DCT缩放解码，返回缩小倍数（1表示未启用）"""
+    if img.format != 'JPEG':
+        return 1
+    width, height = img.size
+    scale = min(target_size[0] / width, target_size[1] / height)
+    if scale * DRAFT_OVERSAMPLE >= 1:
+        return 1  # 目标不够小，缩放解码没有收益
+
+    # 请求尺寸按宽高比计算，Pillow会选择不小于该尺寸的最大缩放级别
+    request = (math.ceil(width * scale * DRAFT_OVERSAMPLE),
+               math.ceil(height * scale * DRAFT_OVERSAMPLE))
+    img.draft(img.mode, request)
+    return round(width / img.size[0])
+
+
+# 多尺寸ICO包含的边长（从大到小）
+ICO_PYRAMID_SIZES = (256, 128, 64, 48, 32, 16)
+ICO_MULTI_LABEL = '多尺寸(16-256)'  # ICO尺寸下拉框中的多尺寸选项
+
+
+def fit_square(img, edge):
+    """按比例缩放到边长edge以内，并居中放在透明正方形画布上"""
+    width, height = img.size
+    scale = edge / max(width, height)
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    if img.size != new_size:
+        img = img.resize(new_size, Image.Resampling.LANCZOS)
+    if new_size == (edge, edge):
+        return img
+    canvas = Image.new('RGBA', (edge, edge), (0, 0, 0, 0))
+    canvas.paste(img, ((edge - new_size[0]) // 2, (edge - new_size[1]) // 2))
+    return canvas
+
+
+def build_ico_frames(img, sizes):
+    """生成ICO各尺寸图层：最大尺寸取自原图，其余每级由上一级缩小而来"""
+    frames = []
+    current = img
+    for edge in sorted(set(sizes), reverse=True):
+        current = fit_square(current, edge)
+        frames.append(current)
+    return frames
+
+
+# 目标大小模式下质量搜索的最大编码次数
+TARGET_SEARCH_MAX_STEPS = 8
+
+
+def encode_to_target(img, save_args, target_bytes, max_quality):
+    """在内存中二分搜索质量参数，返回 (编码字节, 质量, 编码次数, 是否达标)
+
+    优先返回不超过目标大小的最高质量；若都超出则返回尝试过的最小编码
+    """
+    best = None  # 满足目标的最高质量 (数据, 质量)
+    smallest = None  # 尝试过的最小编码 (数据, 质量)
+    lo, hi = 1, max_quality
+    quality = max_quality  # 先尝试上限质量，多数小图一次即可达标
+    steps = 0
+    while lo <= hi and steps < TARGET_SEARCH_MAX_STEPS:
+        buffer = io.BytesIO()
+        img.save(buffer, **dict(save_args, quality=quality))
+        steps += 1
+        data = buffer.getvalue()
+        if len(data) <= target_bytes:
+            best = (data, quality)
+            lo = quality + 1
+        else:
+            if smallest is None or len(data) < len(smallest[0]):
+                smallest = (data, quality)
+            hi = quality - 1
+        quality = (lo + hi) // 2
+
+    if best is not None:
+        return best[0], best[1], steps, True
+    return smallest[0], smallest[1], steps, False
+
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """分块计算文件内容哈希，不把整个文件读入内存"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def convert_image(input_path, output_dir, options, known_hash=None, hash_content=False):
+    """转换单个图片文件（模块级函数，供进程池调用）
+
+    options 为普通字典，包含 format / compress / max_size / quality / ico_sizes / target_kb，
+    返回包含输出文件名和字节数的结果字典，失败时直接抛出异常；
+    known_hash 为清单中记录的内容哈希，内容未变化时跳过转换；
+    只有使用清单（known_hash 或 hash_content）时才计算内容哈希
+    """
+    output_format = options['format']
+    ico_sizes = options.get('ico_sizes')
+    filename = os.path.basename(input_path)
+    name = os.path.splitext(filename)[0]
+    output_name = f"{name}.{output_format}"
+    output_path = os.path.join(output_dir, output_name)
+
+    stat = os.stat(input_path)
+    result = {
+        'input_path': input_path,
+        'output_name': output_name,
+        'in_bytes': stat.st_size,
+        'out_bytes': 0,
+        'note': '',
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'content_hash': file_content_hash(input_path) if known_hash or hash_content else None,
+        'skipped': False,
+    }
+    if known_hash and known_hash == result['content_hash'] and os.path.exists(output_path):
+        result['skipped'] = True  # 仅修改时间变化，内容与上次一致
+        return result
+
+    # 直接从路径解码，不在解码期间额外持有整个文件的字节（内存预算只按解码像素估算）
+    with Image.open(input_path) as img:
+        # 计算最终目标尺寸，JPEG可直接按缩放级别解码
+        notes = []
+        target_size = conversion_target_size(options)
+        if target_size:
+            draft_scale = apply_jpeg_draft(img, target_size)
+            if draft_scale > 1:
+                start = time.perf_counter()
+                img.load()
+                notes.append(f"草稿解码 1/{draft_scale}，解码 {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        # 尺寸压缩（如果启用）
+        if options['compress']:
+            img.thumbnail((options['max_size'], options['max_size']), Image.Resampling.LANCZOS)
+
+        # 透明通道处理；JPEG另外不支持调色板、16位等模式，统一转为RGB
+        if img.mode in ('RGBA', 'LA', 'PA') and output_format in ('jpeg', 'bmp'):
+            img = img.convert('RGB')
+        elif output_format == 'jpeg' and img.mode not in ('RGB', 'L', 'CMYK'):
+            img = img.convert('RGB')
+
+        # 设置保存参数
+        save_args = {'format': output_format}
+        if ico_sizes:
+            # ICO尺寸调整（保持宽高比，多尺寸时由上一级逐级缩小）
+            frames = build_ico_frames(img, ico_sizes)
+            img = frames[0]
+            save_args['sizes'] = [frame.size for frame in frames]
+            save_args['append_images'] = frames[1:]
+        elif output_format == 'jpeg':
+            save_args['quality'] = options['quality']
+            save_args['optimize'] = True
+        elif output_format == 'webp':
+            save_args['quality'] = options['quality']
+        elif output_format == 'png':
+            save_args['optimize'] = True
+            save_args['compress_level'] = 9
+
+        target_kb = options.get('target_kb')
+        if target_kb and output_format in ('jpeg', 'webp'):
+            # 目标大小模式：在内存中搜索质量，只把最终结果写入磁盘
+            encoded, quality, steps, fits = encode_to_target(
+                img, save_args, target_kb * 1024, options['quality'])
+            with open(output_path, 'wb') as f:
+                f.write(encoded)
+            notes.append(f"目标 {target_kb} KB：质量 {quality}，编码 {steps} 次"
+                         + ("" if fits else "，未能达到目标"))
+        else:
+            # 保存文件
+            img.save(output_path, **save_args)
+
+    result['out_bytes'] = os.path.getsize(output_path)
+    result['note'] = '；'.join(notes)
+    return result
+
+
+# 增量转换清单文件名（保存在输出目录中）
+MANIFEST_NAME = '.convert_manifest.sqlite'
+
+
+class ConversionManifest:
+    """增量转换清单：记录每个输入文件的大小、修改时间、内容哈希和转换参数"""
+
+    def __init__(self, output_dir, batch_size=500):
+        self.output_dir = output_dir
+        self.batch_size = batch_size  # 累计多少条记录提交一次事务
+        self.pending = 0
+        self.conn = sqlite3.connect(os.path.join(output_dir, MANIFEST_NAME))
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS files (
+            input_path TEXT NOT NULL,
+            params TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            output_name TEXT NOT NULL,
+            PRIMARY KEY (input_path, params))""")
+
+    @staticmethod
+    def params_key(options):
+        """把转换参数序列化为清单键（参数不同视为不同的输出）"""
+        return json.dumps({
+            'format': options['format'],
+            'compress': options['compress'],
+            'max_size': options['max_size'],
+            'quality': options['quality'],
+            'ico_sizes': options.get('ico_sizes'),
+            'target_kb': options.get('target_kb'),
+        }, sort_keys=True)
+
+    def check(self, input_path, params):
+        """检查文件是否需要转换，返回 (可否跳过, 需由工作进程复核的内容哈希)"""
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, content_hash, output_name FROM files "
+            "WHERE input_path = ? AND params = ?",
+            (os.path.abspath(input_path), params)).fetchone()
+        if row is None or not os.path.exists(os.path.join(self.output_dir, row[3])):
+            return False, None
+        stat = os.stat(input_path)
+        if stat.st_size != row[0]:
+            return False, None
+        if stat.st_mtime_ns == row[1]:
+            return True, None
+        return False, row[2]  # 大小相同但修改时间变化，比对内容哈希
+
+    def record(self, result, params):
+        """记录一次成功转换（或哈希复核通过）的结果"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(result['input_path']), params, result['size'],
+             result['mtime_ns'], result['content_hash'], result['output_name']))
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        """提交剩余记录并关闭数据库"""
+        self.conn.commit()
+        self.conn.close()
+
+
+# 转换检查点日志文件名（保存在输出目录中）
+JOURNAL_NAME = '.convert_job.journal'
+
+
+class ConversionJournal:
+    """追加写入的转换检查点日志，批量fsync，用于中断或崩溃后继续任务
+
+    每行一条JSON记录：任务参数(job)、已发现文件(d)、已完成文件(c)、
+    扫描结束(scan_done)、任务结束(end)
+    """
+
+    def __init__(self, output_dir, sync_every=200, sync_interval=2.0):
+        self.path = os.path.join(output_dir, JOURNAL_NAME)
+        self.sync_every = sync_every  # 累计多少条记录fsync一次
+        self.sync_interval = sync_interval  # 距上次fsync超过多少秒也会落盘
+        self.file = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def start(self, job):
+        """开始新任务：覆盖旧日志并写入任务参数"""
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self._write({'job': job})
+        self.sync()
+
+    def reopen(self):
+        """继续上次任务：以追加方式打开，补齐崩溃时未写完的行"""
+        needs_newline = False
+        with open(self.path, 'rb') as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        self.file = open(self.path, 'a', encoding='utf-8')
+        if needs_newline:
+            self.file.write('\n')
+
+    def discovered(self, path):
+        self._write({'d': path})
+
+    def completed(self, path):
+        self._write({'c': path})
+
+    def scan_done(self):
+        self._write({'scan_done': True})
+
+    def finish(self):
+        """记录任务全部完成"""
+        self._write({'end': True})
+        self.sync()
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """把缓冲的记录一次性写入磁盘（组提交）"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    @staticmethod
+    def load(output_dir):
+        """读取上次任务的检查点，日志不存在时返回None"""
+        path = os.path.join(output_dir, JOURNAL_NAME)
+        if not os.path.exists(path):
+            return None
+        state = {'job': None, 'discovered': [], 'completed': set(), 'scan_done': False, 'ended': False}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时最后一行可能不完整
+                if 'd' in record:
+                    state['discovered'].append(record['d'])
+                elif 'c' in record:
+                    state['completed'].add(record['c'])
+                elif 'job' in record:
+                    state['job'] = record['job']
+                elif record.get('scan_done'):
+                    state['scan_done'] = True
+                elif record.get('end'):
+                    state['ended'] = True
+        return state
 
 
 # ==================== 图片格式转换模块 ====================
@@ -292,9 +2138,14 @@ class ConvertModule(BaseModule):
     def __init__(self, parent):
         # 初始化变量
         self.input_files = []  # 存储用户选择的图片路径列表
+        self.input_folder = ""  # 选择的图片文件夹（转换时边扫描边处理）
+        self.channel = None  # 当前任务的进度通道
+        self.job_active = False  # 界面是否处于转换中状态
         self.output_dir = ""  # 输出目录路径
         self.conversion_running = False  # 标记是否正在转换
         self.enable_compression = tk.BooleanVar(value=True)  # 压缩开关状态
+        self.incremental = tk.BooleanVar(value=True)  # 增量转换开关（跳过未变化文件）
+        self.target_size_mode = tk.BooleanVar(value=False)  # 目标文件大小模式开关
         super().__init__(parent)  # 调用父类初始化
 
     # -------------------- 必须存在的文件操作方法 --------------------
@@ -307,29 +2158,21 @@ class ConvertModule(BaseModule):
         )
         if files:  # 如果用户选择了文件
             self.input_files = list(files)  # 存储文件路径
+            self.input_folder = ""
             # 在日志区域显示选择结果
             self.log_area.config(state=tk.NORMAL)
             self.log_area.insert(tk.END, f"已选择 {len(files)} 个文件\n", "success")
             self.log_area.config(state=tk.DISABLED)
 
     def select_folder(self):
-        """递归选择文件夹中的图片"""
+        """选择图片文件夹（扫描在转换时于后台进行）"""
         folder = filedialog.askdirectory(title="选择图片文件夹")  # 弹出文件夹选择对话框
         if folder:
+            self.input_folder = folder
             self.input_files = []  # 清空原有文件列表
-            # 支持的图片后缀
-            supported_ext = ('png', 'jpg', 'jpeg', 'bmp', 'webp', 'ico')
-            # 遍历文件夹及其子文件夹
-            for root, _, files in os.walk(folder):
-                for f in files:
-                    # 获取文件后缀并检查是否支持
-                    file_ext = f.split('.')[-1].lower()
-                    if file_ext in supported_ext:
-                        # 拼接完整路径并添加到列表
-                        self.input_files.append(os.path.join(root, f))
             # 更新日志
             self.log_area.config(state=tk.NORMAL)
-            self.log_area.insert(tk.END, f"已添加 {len(self.input_files)} 个文件\n", "success")
+            self.log_area.insert(tk.END, f"已选择文件夹：{folder}（开始转换后边扫描边处理）\n", "success")
             self.log_area.config(state=tk.DISABLED)
 
     def select_output_dir(self):
@@ -347,7 +2190,8 @@ class ConvertModule(BaseModule):
         help_text = """使用说明：
 1. 选择图片文件或整个文件夹
 2. 设置输出格式、压缩选项和目录
-3. 点击【开始转换】执行操作"""
+3. 点击【开始转换】执行操作
+4. 可随时停止，之后点击【继续上次任务】从中断处继续"""
         ttk.Label(self.frame, text=help_text, foreground=COLORS['text']).pack(pady=5, anchor="w")
 
         # 文件选择区域
@@ -414,12 +2258,23 @@ class ConvertModule(BaseModule):
         self.quality.set(85)
         self.quality.pack(side='left', padx=5)
 
+        # 目标文件大小设置（JPEG/WEBP按目标大小自动搜索质量，上限为上方质量）
+        ttk.Checkbutton(self.compression_frame,
+                        text="目标大小(KB):",
+                        variable=self.target_size_mode).pack(side='left', padx=5)
+        self.target_kb = ttk.Spinbox(self.compression_frame,
+                                     from_=10,
+                                     to=100000,
+                                     width=6)
+        self.target_kb.set(500)
+        self.target_kb.pack(side='left', padx=5)
+
         self.compression_frame.pack(side='left', padx=5)
 
         # ICO尺寸设置区域
         self.ico_frame = ttk.Frame(settings_frame)
         ttk.Label(self.ico_frame, text="尺寸:").pack(side='left')
-        self.ico_sizes = ['16x16', '32x32', '48x48', '64x64', '128x128', '256x256']
+        self.ico_sizes = ['16x16', '32x32', '48x48', '64x64', '128x128', '256x256', ICO_MULTI_LABEL]
         self.size_var = tk.StringVar(value='256x256')
         ico_combobox = ttk.Combobox(self.ico_frame,
                                     textvariable=self.size_var,
@@ -440,16 +2295,48 @@ class ConvertModule(BaseModule):
                                       text="未选择",
                                       foreground=COLORS['text'])
         self.output_label.pack(side='left', padx=5)
+        # 增量转换复选框
+        ttk.Checkbutton(output_frame,
+                        text="增量转换（跳过未变化文件）",
+                        variable=self.incremental).pack(side='left', padx=15)
 
         # 转换按钮和进度条
         btn_frame = ttk.Frame(self.frame)
+        # 并行进程数设置
+        ttk.Label(btn_frame, text="并行进程:").pack(side='left', padx=5)
+        self.workers_spin = ttk.Spinbox(btn_frame,
+                                        from_=1,
+                                        to=max(os.cpu_count() or 1, 1),
+                                        width=4)
+        self.workers_spin.set(os.cpu_count() or 1)
+        self.workers_spin.pack(side='left', padx=5)
+        # 解码内存预算设置
+        ttk.Label(btn_frame, text="内存预算(MB):").pack(side='left', padx=5)
+        self.budget_spin = ttk.Spinbox(btn_frame,
+                                       from_=64,
+                                       to=65536,
+                                       width=6)
+        self.budget_spin.set(2048)
+        self.budget_spin.pack(side='left', padx=5)
         self.convert_btn = ttk.Button(btn_frame,
                                       text="▶ 开始转换",
                                       style='Primary.TButton',
                                       command=self.start_conversion)
         self.convert_btn.pack(side='left', padx=5)
+        self.stop_btn = ttk.Button(btn_frame,
+                                   text="⏹ 停止",
+                                   command=self.stop_conversion,
+                                   state='disabled')
+        self.stop_btn.pack(side='left', padx=5)
+        self.resume_btn = ttk.Button(btn_frame,
+                                     text="⏯ 继续上次任务",
+                                     command=self.resume_conversion)
+        self.resume_btn.pack(side='left', padx=5)
         self.progress = ttk.Progressbar(btn_frame, mode="determinate")
         self.progress.pack(side='left', padx=5, fill=tk.X, expand=True)
+        # 实时计数（已发现 / 已完成）
+        self.stats_label = ttk.Label(btn_frame, text="", foreground=COLORS['text'])
+        self.stats_label.pack(side='left', padx=5)
         btn_frame.pack(pady=10, fill='x', padx=15)
 
         # 日志区域
@@ -461,10 +2348,12 @@ class ConvertModule(BaseModule):
         self.log_area.pack(fill='both', expand=True)
         # 配置日志颜色标签
         self.log_area.tag_config("success", foreground=COLORS['success'])
+        self.log_area.tag_config("warning", foreground=COLORS['warning'])
         self.log_area.tag_config("error", foreground=COLORS['danger'])
         self.log_area.config(state=tk.DISABLED)  # 禁止手动编辑
 
         self.toggle_ico_settings()  # 初始化ICO设置
+        self.refresh_stats()  # 启动计数刷新
 
     # -------------------- 功能方法 --------------------
     def toggle_compression_settings(self):
@@ -481,10 +2370,47 @@ class ConvertModule(BaseModule):
         else:
             self.ico_frame.pack_forget()
 
+    def refresh_stats(self):
+        """在主线程定时批量读取进度通道，刷新进度条、速度和剩余时间"""
+        if self.channel is not None:
+            stats, elapsed = self.channel.snapshot()
+            total = stats['total'] or stats['discovered']  # 文件夹模式下总数随扫描增长
+            self.progress["maximum"] = max(total, 1)
+            self.progress["value"] = stats['done']
+
+            text = f"已完成 {stats['done']}/{total} 个"
+            if elapsed > 0 and stats['done']:
+                files_rate = stats['done'] / elapsed
+                text += f"  {files_rate:.1f} 张/秒  {stats['bytes'] / 1048576 / elapsed:.1f} MB/秒"
+                if stats['scanning']:
+                    text += "  剩余时间：扫描中"
+                elif not stats['finished']:
+                    text += f"  剩余 {format_duration((total - stats['done']) / files_rate)}"
+            elif stats['scanning']:
+                text += "（扫描中）"
+            text += f"  内存预算 {stats['budget_used'] / 1048576:.0f}/{stats['budget_limit'] / 1048576:.0f} MB"
+            self.stats_label.config(text=text)
+
+            # 后台任务结束后恢复界面状态
+            if stats['finished'] and self.job_active:
+                self.job_active = False
+                self.progress["value"] = 0
+                self.convert_btn.config(state='normal', text="▶ 开始转换")
+                self.resume_btn.config(state='normal')
+                self.stop_btn.config(state='disabled')
+        self.frame.after(250, self.refresh_stats)
+
+    def selected_ico_sizes(self):
+        """解析ICO尺寸下拉框，返回边长列表"""
+        size = self.size_var.get()
+        if size == ICO_MULTI_LABEL:
+            return list(ICO_PYRAMID_SIZES)
+        return [int(size.split('x')[0])]
+
     def start_conversion(self):
         """开始转换（包含参数验证）"""
         # 输入验证
-        if not self.input_files:
+        if not self.input_files and not self.input_folder:
             messagebox.showerror("错误", "请先选择输入文件")
             return
         if not self.output_dir:
@@ -509,82 +2435,884 @@ class ConvertModule(BaseModule):
                 messagebox.showerror("错误", "质量参数需为1-100的整数")
                 return
 
+            if self.target_size_mode.get():
+                if self.format_var.get() not in ('JPEG', 'WEBP'):
+                    messagebox.showerror("错误", "目标大小模式仅支持JPEG/WEBP格式")
+                    return
+                try:
+                    target_kb = int(self.target_kb.get())
+                    if target_kb < 1:
+                        raise ValueError
+                except:
+                    messagebox.showerror("错误", "目标大小需为正整数（KB）")
+                    return
+
+        settings = self.read_runtime_settings()
+        if settings is None:
+            return
+
+        # 在主线程收集参数（后台线程不直接读取Tk变量）
+        output_format = self.format_var.get().lower()
+        compress = self.enable_compression.get()
+        options = {
+            'format': output_format,
+            'compress': compress,
+            'max_size': int(self.max_size.get()) if compress else 99999,  # 不压缩模式设置极大值
+            'quality': int(self.quality.get()) if compress else 100,  # 不压缩模式使用最高质量
+            'ico_sizes': self.selected_ico_sizes() if output_format == 'ico' else None,
+            'target_kb': int(self.target_kb.get()) if compress and self.target_size_mode.get() else None
+        }
+        job = {'files': list(self.input_files), 'folder': self.input_folder,
+               'options': options, 'incremental': self.incremental.get()}
+        self.launch_conversion(job, *settings)
+
+    def read_runtime_settings(self):
+        """验证并返回运行参数 (并行进程数, 内存预算MB)，无效时提示并返回None"""
+        # 并行进程数验证
+        try:
+            workers = int(self.workers_spin.get())
+            if workers < 1:
+                raise ValueError
+        except:
+            messagebox.showerror("错误", "并行进程数需为正整数")
+            return None
+
+        # 内存预算验证
+        try:
+            budget_mb = int(self.budget_spin.get())
+            if budget_mb < 1:
+                raise ValueError
+        except:
+            messagebox.showerror("错误", "内存预算需为正整数（MB）")
+            return None
+        return workers, budget_mb
+
+    def launch_conversion(self, job, workers, budget_mb, resume=None):
+        """切换界面状态并启动后台转换线程"""
         # 禁用按钮防止重复点击
         self.convert_btn.config(state='disabled', text="⏳ 转换中...")
+        self.resume_btn.config(state='disabled')
+        self.stop_btn.config(state='normal')
         self.conversion_running = True
+        self.job_active = True
         # 启动后台线程
-        Thread(target=self.convert_files, daemon=True).start()
-
-    def convert_files(self):
-        """执行转换核心逻辑"""
-        output_format = self.format_var.get().lower()
-        ico_size = tuple(map(int, self.size_var.get().split('x'))) if output_format == 'ico' else None
-
-        # 获取压缩参数
-        if self.enable_compression.get():
-            max_size = int(self.max_size.get())
-            quality = int(self.quality.get())
-        else:  # 不压缩模式
-            max_size = 99999  # 设置极大值
-            quality = 100  # 最高质量
-
-        # 设置进度条
-        self.progress["maximum"] = len(self.input_files)
-        self.progress["value"] = 0
-
-        # 处理每个文件
-        for idx, input_path in enumerate(self.input_files):
-            if not self.conversion_running:
-                break
-
+        Thread(target=self.convert_files,
+               kwargs={'job': job, 'workers': workers, 'budget_mb': budget_mb, 'resume': resume},
+               daemon=True).start()
+
+    def stop_conversion(self):
+        """请求停止转换：不再提交新任务，等待进行中的文件完成"""
+        if self.conversion_running:
+            self.conversion_running = False
+            self.stop_btn.config(state='disabled')
+            self.log_queue.put(("warning", "正在停止，等待进行中的文件完成..."))
+
+    def resume_conversion(self):
+        """从输出目录中的检查点日志继续上次任务"""
+        if not self.output_dir:
+            self.select_output_dir()
+            if not self.output_dir:
+                return
+        state = ConversionJournal.load(self.output_dir)
+        if state is None or state['job'] is None:
+            messagebox.showinfo("提示", "输出目录中没有可继续的转换任务")
+            return
+        if state['ended']:
+            messagebox.showinfo("提示", "上次任务已全部完成，无需继续")
+            return
+        settings = self.read_runtime_settings()
+        if settings is None:
+            return
+        self.launch_conversion(state['job'], *settings, resume=state)
+
+    def convert_files(self, job, workers=1, budget_mb=2048, resume=None):
+        """执行转换核心逻辑（进程池并行，结果按完成顺序回传）
+
+        流水线：扫描 → 读取文件头估算像素内存 → 预算放行 → 进程池解码/编码 → 收集结果。
+        选择文件夹时一边扫描一边提交任务；在途任务数和解码像素字节数均有上限，
+        大图会等待预算释放而不是一起解码导致内存耗尽。
+        每个完成的文件写入检查点日志，resume 为上次日志的状态时从中断处继续
+        """
+        files, folder, options = job['files'], job['folder'], job['options']
+        budget = PixelBudget(budget_mb * 1024 * 1024)
+        # 进度通道：只在此线程写入，界面线程定时读取
+        channel = self.channel = ProgressChannel(
+            total=0, discovered=0, done=0, bytes=0,
+            scanning=bool(folder), budget_used=0, budget_limit=budget.limit)
+        converted = skipped = failed = 0
+        manifest = None
+        journal = ConversionJournal(self.output_dir)
+
+        def on_scan_error(error):
+            self.log_queue.put(("error", f"扫描失败: {error}"))
+
+        def collect(future, path, estimate):
+            """处理一个已完成的任务结果并释放其内存预算"""
+            nonlocal converted, skipped, failed
+            budget.release(estimate)
+            channel.set(budget_used=budget.used)
+            filename = os.path.basename(path)
             try:
-                filename = os.path.basename(input_path)
-                with Image.open(input_path) as img:
-                    # 尺寸压缩（如果启用）
-                    if self.enable_compression.get():
-                        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-
-                    # 透明通道处理
-                    if img.mode in ('RGBA', 'LA') and output_format in ('jpeg', 'bmp'):
-                        img = img.convert('RGB')
-
-                    # ICO尺寸调整
-                    if ico_size:
-                        img = img.resize(ico_size, Image.Resampling.LANCZOS)
-
-                    # 生成输出路径
-                    name = os.path.splitext(filename)[0]
-                    output_path = os.path.join(self.output_dir, f"{name}.{output_format}")
-
-                    # 设置保存参数
-                    save_args = {'format': output_format}
-                    if output_format == 'jpeg':
-                        save_args['quality'] = quality
-                        save_args['optimize'] = True
-                    elif output_format == 'webp':
-                        save_args['quality'] = quality
-                    elif output_format == 'png':
-                        save_args['optimize'] = True
-                        save_args['compress_level'] = 9
-
-                    # 保存文件
-                    img.save(output_path, **save_args)
-                    # 记录日志
-                    self.log_queue.put(("success", f"成功: {filename} → {name}.{output_format}"))
-                    # 更新进度
-                    self.progress["value"] = idx + 1
-                    self.master.update_idletasks()
-
+                result = future.result()
+                journal.completed(path)
+                if manifest:
+                    manifest.record(result, params)
+                if result['skipped']:
+                    skipped += 1
+                else:
+                    converted += 1
+                    channel.add(bytes=result['in_bytes'])
+                    message = f"成功: {filename} → {result['output_name']}"
+                    if result['note']:
+                        message += f"（{result['note']}）"
+                    self.log_queue.put(("success", message))
             except Exception as e:
+                failed += 1
                 self.log_queue.put(("error", f"失败: {filename} - {str(e)}"))
 
-        # 重置状态
+            # 更新进度
+            channel.add(done=1)
+
+        try:
+            if job['incremental']:
+                manifest = ConversionManifest(self.output_dir)
+            params = ConversionManifest.params_key(options)
+
+            # 确定待处理文件来源（继续任务时跳过检查点中已完成的文件）
+            known = set()
+            if resume:
+                journal.reopen()
+                completed = resume['completed']
+                known = set(resume['discovered']) if folder else set(files)
+                remaining = [p for p in (resume['discovered'] if folder else files) if p not in completed]
+                self.log_queue.put(("success", f"继续上次任务：已完成 {len(completed)} 个，剩余已知 {len(remaining)} 个"))
+                if folder and not resume['scan_done']:
+                    # 上次扫描未结束：先处理已知文件，再补扫未记录的文件
+                    sources = itertools.chain(
+                        remaining,
+                        (p for p in iter_image_files(folder, on_scan_error) if p not in known))
+                else:
+                    channel.set(total=len(remaining), scanning=False)
+                    sources = remaining
+            else:
+                journal.start(job)
+                if folder:
+                    sources = iter_image_files(folder, on_scan_error)
+                else:
+                    channel.set(total=len(files))
+                    sources = files
+            max_in_flight = workers * 4  # 限制已提交未完成的任务数，扫描结果随取随用
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = {}
+                for path in sources:
+                    if not self.conversion_running:
+                        break
+                    channel.add(discovered=1)
+                    if folder and path not in known:
+                        journal.discovered(path)
+
+                    known_hash = None
+                    if manifest:
+                        try:
+                            up_to_date, known_hash = manifest.check(path, params)
+                        except OSError:
+                            up_to_date = False  # 交由工作进程报告具体错误
+                        if up_to_date:
+                            skipped += 1
+                            journal.completed(path)
+                            channel.add(done=1)
+                            continue
+
+                    try:
+                        estimate = estimate_decoded_bytes(path, options)
+                    except Exception:
+                        estimate = 0  # 文件头无法识别，交由工作进程报告具体错误
+
+                    # 在途任务过多或预算不足时，先收集已完成的结果
+                    while pending and (len(pending) >= max_in_flight or not budget.fits(estimate)):
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            collect(future, *pending.pop(future))
+
+                    budget.acquire(estimate)
+                    channel.set(budget_used=budget.used)
+                    future = executor.submit(convert_image, path, self.output_dir, options, known_hash,
+                                             manifest is not None)
+                    pending[future] = (path, estimate)
+                if self.conversion_running and folder:
+                    journal.scan_done()
+                channel.set(scanning=False)
+
+                # 按完成顺序收集剩余结果
+                while pending and self.conversion_running:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future, *pending.pop(future))
+                if pending:
+                    # 停止：取消尚未开始的任务，已在执行的文件照常完成并写入检查点
+                    for future in pending:
+                        future.cancel()
+                    for future, (path, estimate) in pending.items():
+                        if not future.cancelled():
+                            collect(future, path, estimate)
+
+            summary = f"转换 {converted} 个，跳过未变化 {skipped} 个，失败 {failed} 个"
+            if self.conversion_running:
+                journal.finish()
+                self.log_queue.put(("success", f"完成：{summary}"))
+            else:
+                self.log_queue.put(("warning", f"已停止：{summary}，可点击【继续上次任务】从中断处继续"))
+        except Exception as e:
+            self.log_queue.put(("error", f"发生未预期错误：{str(e)}"))
+        finally:
+            self.conversion_running = False
+            journal.close()
+            if manifest:
+                manifest.close()
+            # 通知界面线程恢复状态
+            channel.set(scanning=False)
+            channel.finish()
         self.log_queue.put(("end", ""))
-        self.frame.after(100, lambda: self.convert_btn.config(
-            state='normal',
-            text="▶ 开始转换"
-        ))
-        self.progress["value"] = 0
+
+
+# ==================== 超链接转换核心 ====================
+LINK_FONT = Font(underline="single", color="0563C1")  # 超链接样式（蓝色带下划线）
+ANY_URL_RE = re.compile(r'https?://[^\s]+')
+HYPERLINK_TAG = f"{{{SHEET_MAIN_NS}}}hyperlink"
+ROW_TAG = f"{{{SHEET_MAIN_NS}}}row"
+SHEET_DATA_TAG = f"{{{SHEET_MAIN_NS}}}sheetData"
+REL_ID_ATTR = f"{{{REL_NS}}}id"
+RELATIONSHIP_TAG = f"{{{PKG_REL_NS}}}Relationship"
+
+
+def collect_link_patterns(cloud_storage_patterns, custom_patterns):
+    """合并预置和自定义样式，返回按匹配优先级排列的 [(名称, 正则, 显示名称)]"""
+    merged = {**cloud_storage_patterns, **custom_patterns}
+    return [(name, pattern["pattern"], pattern["display"]) for name, pattern in merged.items()]
+
+
+# 主机名预筛选：正则中 "://" 之后到 "/" 之前的部分（主机）只由字面量和安全的字符类组成时，
+# 可按主机名最后两级（如 baidu.com）建立索引，单元格只运行主机名对应的样式
+HOST_RE = re.compile(r'(?=://([^/\s?#:]+))')  # 前瞻匹配，相邻的 "://" 不会被吞掉
+HOST_TERMINATORS = set('/?#:') | set(' \t\r\n\f\v')
+GAP = '\0'  # 必需字面量序列中的占位（非字面量部分）
+HOST_CACHE_SIZE = 4096  # 主机名 → 候选样式的缓存上限，超出后清空重建
+
+
+def _cannot_cross_host(items):
+    """判断一段正则是否不可能匹配主机名结束符（/ ? # : 或空白），用于确认主机部分的对齐"""
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            if chr(av) in HOST_TERMINATORS:
+                return False
+        elif op == sre_parse.IN:
+            for member_op, member_av in av:
+                if member_op == sre_parse.LITERAL:
+                    if chr(member_av) in HOST_TERMINATORS:
+                        return False
+                elif member_op == sre_parse.RANGE:
+                    if any(member_av[0] <= ord(ch) <= member_av[1] for ch in HOST_TERMINATORS):
+                        return False
+                elif not (member_op == sre_parse.CATEGORY
+                          and member_av in (sre_parse.CATEGORY_WORD, sre_parse.CATEGORY_DIGIT)):
+                    return False  # 取反字符类、其他类别可能匹配结束符
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            if not _cannot_cross_host(av[2]):
+                return False
+        elif op == sre_parse.SUBPATTERN:
+            if not _cannot_cross_host(av[-1]):
+                return False
+        elif op == sre_parse.BRANCH:
+            if not all(_cannot_cross_host(branch) for branch in av[1]):
+                return False
+        elif op != sre_parse.AT:  # 行首行尾等零宽断言不消耗字符
+            return False
+    return True
+
+
+def _required_sequence(items, tokens):
+    """展开每次匹配都必须出现的字面量序列：字面量为字符，其他部分为 (GAP, 节点列表)"""
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            tokens.append(chr(av))
+        elif op == sre_parse.SUBPATTERN and not av[1]:  # 不带局部标记的分组按原样展开
+            _required_sequence(av[-1], tokens)
+        elif op == sre_parse.AT:
+            continue
+        else:
+            tokens.append((GAP, [(op, av)]))
+    return tokens
+
+
+def analyze_link_pattern(pattern):
+    """分析样式正则，返回 (是否必含"://", 主机名索引键或None)
+
+    索引键为主机名最后两级（小写）；主机部分含无法确认的成分时返回None，该样式对所有链接都运行
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return False, None
+    tokens = _required_sequence(parsed.data if hasattr(parsed, 'data') else list(parsed), [])
+    text = ''.join(token if isinstance(token, str) else GAP for token in tokens)
+    scheme = text.find('://')
+    if scheme < 0:
+        return False, None
+    start = scheme + 3
+    slash = text.find('/', start)
+    if slash < 0:
+        return True, None  # 正则没有限定主机在哪里结束
+    host = text[start:slash]
+    for position in range(start, slash):
+        token = tokens[position]
+        if not isinstance(token, str) and not _cannot_cross_host(token[1]):
+            return True, None
+    if any(ch in HOST_TERMINATORS or ch == '@' for ch in host):
+        return True, None  # 带端口或用户信息：单元格中提取的主机名在 ":" 处截止，对不上索引键
+    literal = host.rsplit(GAP, 1)[-1]
+    labels = literal.split('.')
+    if len(labels) < 2 or not all(labels[-2:]):
+        return True, None
+    if GAP in host and len(labels) < 3:
+        return True, None  # 占位紧贴在倒数第二级前面，无法确认完整的一级
+    return True, '.'.join(labels[-2:]).lower()
+
+
+def host_key(host):
+    """主机名（可带用户信息）的索引键：最后两级，小写"""
+    return '.'.join(host.rsplit('@', 1)[-1].lower().split('.')[-2:])
+
+
+class PriorityRegex:
+    """把一组样式编译为一个带命名分组的多选正则，按优先级返回第一个匹配的样式
+
+    多选正则返回的是最靠左的匹配；若它来自第k个样式，优先级更高的样式（0..k-1）
+    只可能在更靠右处匹配，于是只用这些样式组成的前缀正则从下一位置继续查找，直到没有更优者。
+    样式之间存在冲突（重复的分组名、反向引用、全局标记等）时抛出 re.error
+    """
+
+    BACKREF_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.prefixes = {}  # k → 前k个样式组成的多选正则
+        if any(self.BACKREF_RE.search(pattern) for pattern in self.patterns):
+            raise re.error("样式含反向引用，合并后分组编号会改变")
+        self.combined = self._prefix(len(self.patterns))
+
+    def _prefix(self, count):
+        regex = self.prefixes.get(count)
+        if regex is None:
+            regex = re.compile('|'.join(f"(?P<_p{index}>(?:{pattern}))"
+                                        for index, pattern in enumerate(self.patterns[:count])))
+            self.prefixes[count] = regex
+        return regex
+
+    def search(self, value):
+        """返回 (匹配对象, 样式序号)，没有匹配时返回None"""
+        best = self.combined.search(value)
+        if best is None:
+            return None
+        index = int(best.lastgroup[2:])
+        while index > 0:
+            better = self._prefix(index).search(value, best.start() + 1)
+            if better is None:
+                break
+            best, index = better, int(better.lastgroup[2:])
+        return best, index
+
+
+class LinkPatternMatcher:
+    """网盘样式匹配器：预筛选 + 单次扫描，结果与按优先级逐个 re.search 相同
+
+    1. 所有样式都必含 "://" 时，不含 "://" 的单元格直接跳过；
+    2. 含链接的单元格取主机名最后两级查索引，只保留可能匹配的样式（不可索引的样式始终保留）；
+    3. 候选样式合并为一个多选正则扫描一遍，每种候选组合编译一次后缓存
+    """
+
+    def __init__(self, patterns):
+        self.patterns = [(name, pattern, display) for name, pattern, display in patterns]
+        self.displays = [display for name, pattern, display in self.patterns]
+        self.always = []  # 对所有含链接的单元格都要运行的样式
+        self.unanchored = []  # 不要求 "://" 的样式，对所有文本都要运行
+        self.index = {}  # 主机名最后两级 → 样式序号列表
+        for position, (name, pattern, display) in enumerate(self.patterns):
+            anchored, key = analyze_link_pattern(pattern)
+            if not anchored:
+                self.unanchored.append(position)
+                self.always.append(position)
+            elif key is None:
+                self.always.append(position)
+            else:
+                self.index.setdefault(key, []).append(position)
+        self.no_scheme = tuple(self.unanchored)
+        self.by_hosts = {}  # 单元格中的主机名序列 → 候选样式序号
+        self.subsets = {}  # 候选样式序号元组 → PriorityRegex
+        self.fallback = None
+        try:
+            self._subset(tuple(range(len(self.patterns))))
+        except re.error:
+            self.fallback = [re.compile(pattern) for name, pattern, display in self.patterns]
+
+    def _subset(self, positions):
+        regex = self.subsets.get(positions)
+        if regex is None:
+            regex = PriorityRegex(self.patterns[position][1] for position in positions)
+            self.subsets[positions] = regex
+        return regex
+
+    def candidates(self, value):
+        """预筛选：返回可能匹配该文本的样式序号（按优先级排序）"""
+        if '://' not in value:
+            return self.no_scheme
+        hosts = tuple(HOST_RE.findall(value))
+        positions = self.by_hosts.get(hosts)
+        if positions is None:
+            selected = set(self.always)
+            for host in hosts:
+                selected.update(self.index.get(host_key(host), ()))
+            positions = tuple(sorted(selected))
+            if len(self.by_hosts) >= HOST_CACHE_SIZE:
+                self.by_hosts.clear()
+            self.by_hosts[hosts] = positions
+        return positions
+
+    def match(self, value):
+        """返回 (链接, 显示名称)，没有样式匹配时返回None"""
+        if not self.no_scheme and '://' not in value:
+            return None  # 最常见的情况：普通文本，所有样式都要求链接
+        positions = self.candidates(value)
+        if not positions:
+            return None
+        if self.fallback is not None:
+            for position in positions:
+                match = self.fallback[position].search(value)
+                if match:
+                    return match.group(0), self.displays[position]
+            return None
+        found = self._subset(positions).search(value)
+        if found is None:
+            return None
+        match, index = found
+        return match.group(0), self.displays[positions[index]]
+
+
+def resolve_text_link(value, link_mode, matcher, unified_name):
+    """为文本单元格找出 (链接, 显示文本)，不需要转换时返回None"""
+    # 统一显示名称模式 - 转换所有链接
+    if link_mode == "unified":
+        url_match = ANY_URL_RE.search(value)
+        return (url_match.group(0), unified_name) if url_match else None
+    # 网盘名称显示模式：按优先级取第一个匹配的样式，匹配到空字符串时不转换
+    if link_mode == "display":
+        found = matcher.match(value)
+        return found if found and found[0] else None
+    # 保持链接模式：直接将单元格文本作为URL
+    if link_mode == "keep":
+        return value, value
+    return None
+
+
+def link_options(link_mode, matcher=None, unified_name="资源链接"):
+    """打包文本转超链接的参数（匹配器可序列化，便于传给其他进程）"""
+    return {'link_mode': link_mode, 'matcher': matcher or LinkPatternMatcher([]), 'unified_name': unified_name}
+
+
+PROGRESS_ROWS = 500  # 每处理这么多行汇报一次进度并检查取消请求
+
+
+class ConversionCancelled(Exception):
+    """转换被用户取消，输出文件未写入"""
+
+
+class RowProgress:
+    """按工作表汇报已处理行数，并在同一时机检查取消请求
+
+    progress(工作表名, 已处理行数, 总行数) 在每 PROGRESS_ROWS 行和工作表结束时调用，
+    总行数未知时为None；全部工作表处理完、开始写文件前以工作表名None调用一次。
+    cancel 为 threading.Event，被设置后抛出 ConversionCancelled
+    """
+
+    def __init__(self, progress=None, cancel=None):
+        self.progress = progress
+        self.cancel = cancel
+        self.sheet = None
+        self.total = None
+
+    def start(self, sheet_name, total):
+        self.sheet, self.total = sheet_name, total
+        self.update(0)
+
+    def update(self, rows):
+        if self.cancel is not None and self.cancel.is_set():
+            raise ConversionCancelled("已取消")
+        if self.progress is not None:
+            self.progress(self.sheet, rows, self.total)
+
+    def saving(self):
+        self.sheet, self.total = None, None
+        self.update(0)
+
+
+def _convert_workbook_full(input_path, output_path, direction, sheets, options, ticker):
+    """完整模式：加载整个对象模型，保留合并单元格、列宽等全部格式"""
+    wb = load_workbook(input_path)
+    processed = 0
+    for sheet_name in sheets if sheets is not None else wb.sheetnames:
+        ws = wb[sheet_name]
+        ticker.start(sheet_name, ws.max_row)
+        row_idx = 0
+        for row_idx, row in enumerate(ws.iter_rows(), 1):
+            if row_idx % PROGRESS_ROWS == 0:
+                ticker.update(row_idx)
+            for cell in row:
+                if direction == 'to_text':
+                    # 将超链接地址设为单元格值并移除超链接
+                    if cell.hyperlink:
+                        cell.value = cell.hyperlink.target or cell.hyperlink.location
+                        cell.hyperlink = None
+                        processed += 1
+                elif cell.value and isinstance(cell.value, str):
+                    found = resolve_text_link(cell.value, options['link_mode'], options['matcher'],
+                                              options['unified_name'])
+                    if found:
+                        cell.hyperlink = found[0]
+                        cell.value = found[1]
+                        cell.font = LINK_FONT
+                        processed += 1
+        ticker.update(row_idx)
+    ticker.saving()
+    wb.save(output_path)
+    return processed
+
+
+EXCEL_MAX_ROW = 1048576
+EXCEL_MAX_COL = 16384
+
+
+class SheetHyperlinks:
+    """工作表中的超链接区域，按行顺序查询
+
+    每个 <hyperlink> 按其 ref 区域保存一次（整列链接也只占一条记录），不展开为逐个单元格；
+    区域重叠时以文档中靠后的为准，与openpyxl加载时的效果一致
+    """
+
+    def __init__(self):
+        self.ranges = []  # (起始行, 结束行, 起始列, 结束列, 文档顺序, 链接)
+        self.position = 0
+        self.active = []
+
+    def add(self, ref, link):
+        min_col, min_row, max_col, max_row = range_boundaries(ref)
+        self.ranges.append((min_row or 1, max_row or EXCEL_MAX_ROW, min_col or 1, max_col or EXCEL_MAX_COL,
+                            len(self.ranges), link))
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def row(self, row_idx):
+        """返回覆盖该行的 [(起始列, 结束列, 链接)]，靠后的区域在前；行号须递增调用"""
+        if self.position == 0 and self.ranges:
+            self.ranges.sort(key=lambda item: item[0])
+        changed = False
+        while self.position < len(self.ranges) and self.ranges[self.position][0] <= row_idx:
+            self.active.append(self.ranges[self.position])
+            self.position += 1
+            changed = True
+        if any(item[1] < row_idx for item in self.active):
+            self.active = [item for item in self.active if item[1] >= row_idx]
+            changed = True
+        if changed:
+            self.active.sort(key=lambda item: item[4], reverse=True)
+        return [(min_col, max_col, link) for min_row, max_row, min_col, max_col, order, link in self.active]
+
+
+def find_row_link(row_links, col_idx):
+    """在 SheetHyperlinks.row 的结果中查找某列的链接"""
+    for min_col, max_col, link in row_links:
+        if min_col <= col_idx <= max_col:
+            return link
+    return None
+
+
+def read_sheet_hyperlinks(archive, worksheet_path):
+    """流式解析工作表XML中的 <hyperlinks> 及其关系文件，返回 SheetHyperlinks（链接为 (外部地址, 内部位置)）
+
+    只读模式的单元格不带超链接信息，这里单独扫描一遍XML；
+    行元素解析后立即清除，内存只与 <hyperlink> 元素数量有关
+    """
+    targets = {}
+    rels_path = get_rels_path(worksheet_path)
+    if rels_path in archive.namelist():
+        with archive.open(rels_path) as src:
+            for event, elem in iterparse(src):
+                if elem.tag == RELATIONSHIP_TAG and elem.get('Type', '').endswith('/hyperlink'):
+                    targets[elem.get('Id')] = elem.get('Target')
+                elem.clear()
+
+    links = SheetHyperlinks()
+    sheet_data = None
+    with archive.open(worksheet_path) as src:
+        for event, elem in iterparse(src, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == SHEET_DATA_TAG:
+                    sheet_data = elem
+                continue
+            if elem.tag == ROW_TAG and sheet_data is not None:
+                sheet_data.clear()  # 单元格数据由只读工作表负责，这里直接丢弃
+            elif elem.tag == HYPERLINK_TAG:
+                links.add(elem.get('ref'), (targets.get(elem.get(REL_ID_ATTR)), elem.get('location')))
+                elem.clear()
+    return links
+
+
+class StyleCopier:
+    """把只读工作簿的单元格样式转换到只写工作簿，每种样式只转换一次
+
+    逐个设置字体、填充等属性需要在目标工作簿的样式表中查找和登记，
+    这里按 (源样式编号, 是否为链接) 缓存转换结果，之后只复制样式数组
+    """
+
+    def __init__(self):
+        self.cache = {}
+
+    def cell(self, ws, source, value, link=False):
+        """生成带原格式（link 时改用链接字体）的只写单元格，无格式时直接返回值"""
+        style_id = getattr(source, '_style_id', 0)  # 空占位单元格没有样式
+        if not style_id and not link:
+            return value
+        out = WriteOnlyCell(ws, value)
+        style = self.cache.get((style_id, link))
+        if style is None:
+            if style_id:
+                out.font = source.font
+                out.fill = source.fill
+                out.border = source.border
+                out.alignment = source.alignment
+                out.number_format = source.number_format
+            if link:
+                out.font = LINK_FONT
+            style = self.cache[(style_id, link)] = StyleArray(out._style)
+        else:
+            out._style = StyleArray(style)
+        return out
+
+
+SHEET_SCAN_CHUNK = 1024 * 1024
+
+
+def check_streaming_internals(src):
+    """确认流式引擎依赖的openpyxl内部属性存在（在openpyxl 3.1中验证）
+
+    只读模式不提供超链接和样式编号的公开接口，流式引擎因此读取：
+    只读工作簿的 _archive、只读工作表的 _worksheet_path、只读单元格的 _style_id、单元格的样式数组 _style。
+    升级openpyxl后若这些属性消失，直接报错，而不是静默丢失链接或格式
+    """
+    missing = []
+    if not hasattr(src, '_archive'):
+        missing.append('_archive')
+    if src.sheetnames and not hasattr(src[src.sheetnames[0]], '_worksheet_path'):
+        missing.append('_worksheet_path')
+    if '_style_id' not in getattr(ReadOnlyCell, '__slots__', ()):
+        missing.append('_style_id')
+    if '_style' not in getattr(StyleableObject, '__slots__', ()):
+        missing.append('_style')
+    if missing:
+        src.close()
+        raise RuntimeError(f"openpyxl {openpyxl.__version__} 缺少流式处理所需的内部属性 "
+                           f"{', '.join(missing)}，请取消勾选【流式处理】")
+
+
+ROW_START_RE = re.compile(rb'<(?:[\w.-]+:)?row\b([^>]*)>')
+ROW_NUMBER_RE = re.compile(rb'\sr="(\d+)"')
+HYPERLINKS_RE = re.compile(rb'<(?:[\w.-]+:)?hyperlinks\b')
+
+
+def scan_worksheet(archive, worksheet_path):
+    """按字节快速扫描工作表XML，返回 (是否含超链接, 最后一行的行号)
+
+    只读模式默认相信 <dimension> 记录，它可能过时（其他程序写出的文件常见），
+    因此流式引擎忽略该记录，进度总行数改由这里的行元素得出；没有链接的工作表无需再解析一遍XML
+    """
+    has_links = False
+    last_row = 0
+    carry = b''
+    with archive.open(worksheet_path) as src:
+        while True:
+            chunk = src.read(SHEET_SCAN_CHUNK)
+            buffer = carry + chunk
+            # 只扫描到最后一个完整标签为止，其余留到下一块
+            cut = len(buffer) if not chunk else buffer.rfind(b'>') + 1
+            text, carry = buffer[:cut], buffer[cut:]
+            for match in ROW_START_RE.finditer(text):
+                number = ROW_NUMBER_RE.search(match.group(1))
+                last_row = int(number.group(1)) if number else last_row + 1
+            if not has_links and HYPERLINKS_RE.search(text):
+                has_links = True
+            if not chunk:
+                return has_links, last_row
+
+
+def _convert_workbook_streaming(input_path, output_path, direction, sheets, options, ticker):
+    """流式模式：只读模式逐行读取、只写模式逐行写出，内存不随行数增长
+
+    保留值、数字格式、字体/填充/边框/对齐以及未转换的超链接；
+    合并单元格、列宽、批注等不会写入输出文件
+    """
+    src = load_workbook(input_path, read_only=True)
+    dst = Workbook(write_only=True)
+    check_streaming_internals(src)
+    styles = StyleCopier()
+    processed = 0
+    selected = set(sheets if sheets is not None else src.sheetnames)
+    link_mode, matcher, unified_name = options['link_mode'], options['matcher'], options['unified_name']
+    try:
+        for sheet_name in src.sheetnames:
+            ws = src[sheet_name]
+            out = dst.create_sheet(title=sheet_name)
+            active = sheet_name in selected
+            # dimension 记录可能过时，按它截断会静默丢失数据：忽略它，逐行读到工作表末尾
+            ws.reset_dimensions()
+            has_links, last_row = scan_worksheet(src._archive, ws._worksheet_path)
+            ticker.start(sheet_name, last_row)
+            row_idx = 0
+            links = None
+            if has_links:
+                links = read_sheet_hyperlinks(src._archive, ws._worksheet_path)
+            for row_idx, row in enumerate(ws.iter_rows(), 1):
+                if row_idx % PROGRESS_ROWS == 0:
+                    ticker.update(row_idx)
+                values = []
+                row_links = links.row(row_idx) if links else None
+                for col_idx, cell in enumerate(row, 1):
+                    value = cell.value
+                    link = find_row_link(row_links, col_idx) if row_links else None
+                    if active and direction == 'to_text':
+                        if link:
+                            value = link[0] or link[1]
+                            link = None
+                            processed += 1
+                    elif active and value and isinstance(value, str):
+                        found = resolve_text_link(value, link_mode, matcher, unified_name)
+                        if found:
+                            out_cell = styles.cell(out, cell, found[1], link=True)
+                            out_cell.hyperlink = found[0]
+                            values.append(out_cell)
+                            processed += 1
+                            continue
+                    out_cell = styles.cell(out, cell, value)
+                    if link:
+                        # 原有超链接原样保留（引用坐标由只写工作表在写出时设置）
+                        if not isinstance(out_cell, Cell):
+                            out_cell = WriteOnlyCell(out, value)
+                        out_cell.hyperlink = Hyperlink(ref="", target=link[0], location=link[1])
+                    values.append(out_cell)
+                out.append(values)
+            ticker.update(row_idx)
+    finally:
+        src.close()
+    ticker.saving()
+    dst.save(output_path)
+    return processed
+
+
+def convert_workbook(input_path, output_path, direction, sheets=None, options=None, streaming=False,
+                     progress=None, cancel=None):
+    """转换一个工作簿，返回转换的链接数
+
+    direction 为 to_text（超链接转文本）或 to_link（文本转超链接）；
+    sheets 为要处理的工作表名称列表，None 表示全部；options 见 link_options；
+    progress / cancel 见 RowProgress，取消时抛出 ConversionCancelled 且不写输出文件
+    """
+    options = options or link_options("keep")
+    engine = _convert_workbook_streaming if streaming else _convert_workbook_full
+    return engine(input_path, output_path, direction, sheets, options, RowProgress(progress, cancel))
+
+
+# 文件夹批量转换：每个工作簿交给进程池中的一个进程，参数（含样式匹配器）随任务序列化传入
+BATCH_REPORT_HEADER = ("文件", "状态", "链接数", "用时(秒)", "错误")
+
+
+def list_workbooks(folder):
+    """列出文件夹中的 .xlsx 工作簿（不递归，跳过Excel打开时生成的 ~$ 临时文件）"""
+    with os.scandir(folder) as entries:
+        return sorted(entry.name for entry in entries
+                      if entry.is_file() and entry.name.lower().endswith('.xlsx') and not entry.name.startswith('~$'))
+
+
+def _convert_workbook_task(input_path, output_path, direction, sheets, options, streaming):
+    """进程池任务：转换一个工作簿，返回 (链接数, 用时秒, 错误信息)，失败时同样记录用时"""
+    started = time.perf_counter()
+    try:
+        processed = convert_workbook(input_path, output_path, direction, sheets, options, streaming)
+        return processed, time.perf_counter() - started, ""
+    except Exception as e:
+        return 0, time.perf_counter() - started, str(e) or type(e).__name__
+
+
+def convert_workbook_folder(input_dir, output_dir, direction, sheets=None, options=None, streaming=False,
+                            workers=1, on_result=None, cancel=None):
+    """用进程池批量转换文件夹中的工作簿，输出到 output_dir 下的同名文件
+
+    每个文件使用相同的方向、工作表选择和样式；on_result(报告行, 文件总数) 在每个文件完成时调用，
+    cancel 被设置后不再提交新文件，进行中的文件照常完成。
+    返回按文件名排列的报告行 (文件, 状态, 链接数, 用时, 错误)，未处理的文件状态为"已取消"
+    """
+    if os.path.normcase(os.path.abspath(input_dir)) == os.path.normcase(os.path.abspath(output_dir)):
+        raise ValueError("输出文件夹不能与输入文件夹相同")
+    os.makedirs(output_dir, exist_ok=True)
+    names = list_workbooks(input_dir)
+    results = {}
+    max_in_flight = workers * 4  # 限制已提交未完成的任务数
+
+    def collect(future, name):
+        try:
+            links, seconds, error = future.result()
+        except Exception as e:  # 工作进程异常退出
+            links, seconds, error = 0, 0.0, str(e) or type(e).__name__
+        row = (name, "失败" if error else "成功", links, round(seconds, 2), error)
+        results[name] = row
+        if on_result:
+            on_result(row, len(names))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for name in names:
+            if cancel is not None and cancel.is_set():
+                break
+            while len(pending) >= max_in_flight:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(future, pending.pop(future))
+            future = executor.submit(_convert_workbook_task, os.path.join(input_dir, name),
+                                     os.path.join(output_dir, name), direction, sheets, options, streaming)
+            pending[future] = name
+        while pending and not (cancel is not None and cancel.is_set()):
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                collect(future, pending.pop(future))
+        # 取消：撤回尚未开始的任务，已在执行的文件照常完成
+        for future in pending:
+            future.cancel()
+        for future, name in pending.items():
+            if not future.cancelled():
+                collect(future, name)
+    return [results.get(name, (name, "已取消", 0, 0, "")) for name in names]
+
+
+def write_batch_report(output_dir, rows, elapsed):
+    """把批量转换结果写成CSV报告（UTF-8带BOM，Excel可直接打开），返回报告路径"""
+    path = os.path.join(output_dir, f"超链接转换报告_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+    succeeded = sum(1 for row in rows if row[1] == "成功")
+    failed = sum(1 for row in rows if row[1] == "失败")
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(BATCH_REPORT_HEADER)
+        writer.writerows(rows)
+        writer.writerow(("合计", f"成功 {succeeded} / 失败 {failed}",
+                         sum(row[2] for row in rows), round(elapsed, 2), ""))
+    return path
 
 
 # ==================== 超链接转换模块 ====================
@@ -592,9 +3320,16 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
     def __init__(self, parent):
         self.input_path = tk.StringVar()  # 输入文件路径
         self.output_path = tk.StringVar()  # 输出文件路径
+        self.batch_mode = tk.BooleanVar(value=False)  # 文件夹批量模式
+        self.input_dir = tk.StringVar()  # 批量模式输入文件夹
+        self.output_dir = tk.StringVar()  # 批量模式输出文件夹
         self.mode = tk.StringVar(value="all")  # 工作表模式
         self.link_mode = tk.StringVar(value="keep")  # 链接显示模式
         self.custom_patterns = {}  # 用户自定义的网盘样式
+        self.link_matcher = None  # 编译后的样式匹配器（样式变化时失效）
+        self.channel = None  # 当前任务的进度通道
+        self.cancel_event = None  # 当前任务的取消请求
+        self.job_active = False  # 界面是否处于任务进行中的状态
         self.sheet_names = []  # 工作表列表
         self.config_file = "hyperlink_config.json"  # 配置文件路径
 
@@ -634,7 +3369,9 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
 1. 选择Excel文件并设置输出路径
 2. 添加自定义网盘样式（可选）
 3. 选择工作表和处理模式
-4. 点击转换按钮执行操作"""
+4. 数十万行的大文件可勾选【流式处理】（不保留合并单元格、列宽和批注）
+5. 勾选【文件夹批量处理】可对整个文件夹的工作簿使用相同设置并行转换，并生成CSV报告
+6. 点击转换按钮执行操作"""
         ttk.Label(self.frame, text=help_text, foreground=COLORS['text']).pack(pady=5, anchor="w")
 
         # ----- 文件选择区域 -----
@@ -651,6 +3388,21 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
         ttk.Button(file_frame, text="浏览", command=self.select_output).pack(side=tk.LEFT)
         file_frame.pack(pady=10)
 
+        # ----- 文件夹批量处理 -----
+        batch_frame = ttk.Frame(self.frame)
+        ttk.Checkbutton(batch_frame, text="文件夹批量处理", variable=self.batch_mode).pack(side=tk.LEFT)
+        ttk.Label(batch_frame, text="输入文件夹:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(batch_frame, textvariable=self.input_dir, width=25).pack(side=tk.LEFT)
+        ttk.Button(batch_frame, text="浏览", command=self.select_input_dir).pack(side=tk.LEFT, padx=5)
+        ttk.Label(batch_frame, text="输出文件夹:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(batch_frame, textvariable=self.output_dir, width=25).pack(side=tk.LEFT)
+        ttk.Button(batch_frame, text="浏览", command=self.select_output_dir).pack(side=tk.LEFT, padx=5)
+        ttk.Label(batch_frame, text="并行进程:").pack(side=tk.LEFT, padx=5)
+        self.workers_spin = ttk.Spinbox(batch_frame, from_=1, to=max(os.cpu_count() or 1, 1), width=4)
+        self.workers_spin.set(os.cpu_count() or 1)
+        self.workers_spin.pack(side=tk.LEFT)
+        batch_frame.pack(pady=5)
+
         # ----- 自定义网盘设置 -----
         custom_frame = ttk.LabelFrame(self.frame, text="自定义网盘样式（支持正则表达式）")
         # 网盘名称
@@ -712,13 +3464,26 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
         self.unified_entry.pack(side=tk.LEFT, padx=5)
         unified_frame.pack(side=tk.LEFT, padx=5)
 
+        # 流式处理（大文件）：逐行读写，只保留值、格式和链接
+        self.streaming = tk.BooleanVar(value=False)
+        ttk.Checkbutton(setting_frame, text="流式处理（大文件）", variable=self.streaming).pack(side=tk.LEFT, padx=10)
+
         setting_frame.pack(pady=10)
 
         # ===== 操作按钮区域 =====
         btn_frame = ttk.Frame(self.frame)
         # 添加两个转换按钮
-        ttk.Button(btn_frame, text="超链接转文本", command=self.convert_to_text, style='Primary.TButton').pack(side=tk.LEFT, padx=5)
-        ttk.Button(btn_frame, text="文本转超链接", command=self.convert_to_hyperlink, style='Primary.TButton').pack(side=tk.LEFT, padx=5)
+        self.to_text_btn = ttk.Button(btn_frame, text="超链接转文本", command=self.convert_to_text, style='Primary.TButton')
+        self.to_text_btn.pack(side=tk.LEFT, padx=5)
+        self.to_link_btn = ttk.Button(btn_frame, text="文本转超链接", command=self.convert_to_hyperlink, style='Primary.TButton')
+        self.to_link_btn.pack(side=tk.LEFT, padx=5)
+        self.cancel_btn = ttk.Button(btn_frame, text="⏹ 取消", command=self.cancel_job, state='disabled')
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
+        # 当前工作表的行进度和处理速度
+        self.progress = ttk.Progressbar(btn_frame, mode="determinate", length=200)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        self.stats_label = ttk.Label(btn_frame, text="", foreground=COLORS['text'])
+        self.stats_label.pack(side=tk.LEFT, padx=5)
         btn_frame.pack(pady=10)
 
         # ========== 样式管理区域 ==========
@@ -761,6 +3526,43 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
         self.log_area.tag_config("error", foreground=COLORS['danger'])
         self.log_area.tag_config("warning", foreground=COLORS['warning'])
 
+        self.refresh_stats()  # 启动进度刷新
+
+    def refresh_stats(self):
+        """在主线程定时读取进度通道，刷新当前工作表的行进度和每秒行数"""
+        if self.channel is not None:
+            stats, elapsed = self.channel.snapshot()
+            total = stats['sheet_total']
+            self.progress["maximum"] = max(total or stats['sheet_rows'], 1)
+            self.progress["value"] = stats['sheet_rows']
+
+            if stats['files_total']:
+                # 批量模式按文件计数
+                self.progress["maximum"] = stats['files_total']
+                self.progress["value"] = stats['files_done']
+                text = f"已完成 {stats['files_done']}/{stats['files_total']} 个文件，失败 {stats['files_failed']} 个"
+                if elapsed > 0 and stats['files_done']:
+                    text += f"  {stats['files_done'] / elapsed:.1f} 个/秒"
+            elif stats['saving']:
+                text = "正在写入输出文件..."
+            elif stats['sheet']:
+                text = f"工作表 {stats['sheet']}：{stats['sheet_rows']}/{total or '?'} 行"
+            else:
+                text = "正在加载工作簿..."
+            if elapsed > 0 and stats['rows'] and not stats['files_total']:
+                text += f"  {stats['rows'] / elapsed:.0f} 行/秒"
+            self.stats_label.config(text=text)
+
+            # 后台任务结束后恢复界面状态
+            if stats['finished'] and self.job_active:
+                self.job_active = False
+                self.progress["value"] = 0
+                self.stats_label.config(text="")
+                self.to_text_btn.config(state='normal')
+                self.to_link_btn.config(state='normal')
+                self.cancel_btn.config(state='disabled')
+        self.frame.after(250, self.refresh_stats)
+
     def refresh_style_list(self):
         """刷新样式列表（区分预置和自定义）"""
         # 清空当前列表
@@ -844,6 +3646,7 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
                 }
 
                 # 保存并刷新列表
+                self.invalidate_link_matcher()
                 self.save_custom_patterns()
                 self.refresh_style_list()
                 edit_win.destroy()
@@ -870,122 +3673,145 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
         # 确认删除
         if messagebox.askyesno("确认", f"确定删除样式 '{values[0]}' 吗？"):
             del self.custom_patterns[values[0]]  # 从字典中删除
+            self.invalidate_link_matcher()
             self.save_custom_patterns()  # 保存更改
             self.refresh_style_list()  # 刷新列表
 
     def convert_to_text(self):
-        """将超链接转换为文本"""
+        """将超链接转换为文本（后台执行）"""
+        self.start_job('to_text')
+
+    def start_job(self, direction, options=None):
+        """在界面线程读取参数并启动后台转换线程（单个文件或文件夹批量）"""
+        if self.running:
+            return
+        if self.batch_mode.get():
+            input_dir, output_dir = self.input_dir.get().strip(), self.output_dir.get().strip()
+            if not input_dir or not output_dir:
+                messagebox.showerror("错误", "请选择输入文件夹和输出文件夹")
+                return
+            try:
+                workers = int(self.workers_spin.get())
+                if workers < 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("错误", "并行进程数需为正整数")
+                return
+            # 批量模式下"全部工作表"指每个文件各自的全部工作表
+            sheets = None if self.sheet_combo.get() in ("", "全部工作表") else [self.sheet_combo.get()]
+            target = self.run_batch_job
+            args = (direction, input_dir, output_dir, sheets, options, self.streaming.get(), workers)
+        else:
+            target = self.run_job
+            args = (direction, self.input_path.get(), self.output_path.get(), self.get_selected_sheets(),
+                    options, self.streaming.get())
+        self.running = True
+        self.job_active = True
+        self.cancel_event = Event()
+        self.channel = ProgressChannel(rows=0, sheet='', sheet_rows=0, sheet_total=0, saving=False,
+                                       files_done=0, files_total=0, files_failed=0)
+        self.to_text_btn.config(state='disabled')
+        self.to_link_btn.config(state='disabled')
+        self.cancel_btn.config(state='normal')
+        Thread(target=target, args=args + (self.channel, self.cancel_event), daemon=True).start()
+
+    def cancel_job(self):
+        """请求取消：单个文件在下一个进度检查点停止且不写出输出文件；批量模式不再开始新文件"""
+        if self.running and self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_btn.config(state='disabled')
+            self.log_queue.put(("warning", "正在取消..."))
+
+    def run_job(self, direction, input_path, output_path, sheets, options, streaming, channel, cancel):
+        """后台线程：执行转换，进度写入通道，结果通过日志队列回传"""
+        current = {'sheet': None, 'rows': 0}
+
+        def on_progress(sheet, rows, total):
+            if sheet is None:
+                channel.set(saving=True)
+                return
+            if sheet != current['sheet']:
+                current['sheet'], current['rows'] = sheet, 0
+            channel.add(rows=rows - current['rows'])
+            channel.set(sheet=sheet, sheet_rows=rows, sheet_total=total or 0)
+            current['rows'] = rows
+
+        noun = "超链接" if direction == 'to_text' else "链接"
         try:
-            # 加载Excel工作簿
-            wb = load_workbook(self.input_path.get())
-            sheets = self.get_selected_sheets()
-            processed = 0  # 计数器
-
-            # 遍历所有选中的工作表
-            for sheet_name in sheets:
-                ws = wb[sheet_name]
-                # 遍历工作表中的所有单元格
-                for row in ws.iter_rows():
-                    for cell in row:
-                        # 检查单元格是否有超链接
-                        if cell.hyperlink:
-                            # 将超链接地址设为单元格值
-                            cell.value = cell.hyperlink.target
-                            # 移除超链接
-                            cell.hyperlink = None
-                            processed += 1  # 增加计数
-
-            # 保存结果
-            wb.save(self.output_path.get())
-            # 记录成功日志
-            self.log_area.config(state=tk.NORMAL)
-            self.log_area.insert(tk.END, f"成功转换 {processed} 个超链接\n", "success")
-            self.log_area.config(state=tk.DISABLED)
+            processed = convert_workbook(input_path, output_path, direction, sheets, options,
+                                         streaming=streaming, progress=on_progress, cancel=cancel)
+            stats, elapsed = channel.snapshot()
+            rate = stats['rows'] / elapsed if elapsed > 0 else 0
+            self.log_queue.put(("success", f"成功转换 {processed} 个{noun}"
+                                           f"（{stats['rows']} 行，{rate:.0f} 行/秒，用时 {format_duration(elapsed)}）"))
+        except ConversionCancelled:
+            self.log_queue.put(("warning", "已取消，未写入输出文件"))
         except Exception as e:
-            # 记录错误日志
-            self.log_area.config(state=tk.NORMAL)
-            self.log_area.insert(tk.END, f"错误：{str(e)}\n", "error")
-            self.log_area.config(state=tk.DISABLED)
+            self.log_queue.put(("error", f"错误：{str(e)}"))
+        finally:
+            self.running = False
+            channel.finish()
+
+    def run_batch_job(self, direction, input_dir, output_dir, sheets, options, streaming, workers, channel, cancel):
+        """后台线程：进程池批量转换文件夹，逐个文件记录日志，结束后写出CSV报告"""
+        started = time.monotonic()
+
+        def on_result(row, total):
+            name, status, links, seconds, error = row
+            channel.set(files_total=total)
+            channel.add(files_done=1, files_failed=1 if error else 0)
+            if error:
+                self.log_queue.put(("error", f"失败: {name} - {error}"))
+            else:
+                self.log_queue.put(("success", f"成功: {name}（{links} 个链接，{seconds:.2f} 秒）"))
 
-    def convert_to_hyperlink(self):
-        """将文本转换为超链接（支持统一显示名称）"""
         try:
-            # 加载Excel工作簿
-            wb = load_workbook(self.input_path.get())
-            sheets = self.get_selected_sheets()
-            processed = 0  # 计数器
-
-            # 获取统一显示名称（如果用户选择了该模式）
-            unified_name = None
-            if self.link_mode.get() == "unified":
-                unified_name = self.unified_display_name.get().strip()
-                if not unified_name:
-                    self.log_area.config(state=tk.NORMAL)
-                    self.log_area.insert(tk.END, "警告：统一显示名称为空，将使用默认名称\n", "warning")
-                    self.log_area.config(state=tk.DISABLED)
-                    unified_name = "资源链接"
-
-            # 遍历所有选中的工作表
-            for sheet_name in sheets:
-                ws = wb[sheet_name]
-                # 遍历工作表中的所有单元格
-                for row in ws.iter_rows():
-                    for cell in row:
-                        # 检查单元格是否有文本内容
-                        if cell.value and isinstance(cell.value, str):
-                            url = None  # 存储找到的URL
-                            display_text = cell.value  # 默认显示文本为原内容
-
-                            # 统一显示名称模式 - 转换所有链接
-                            if self.link_mode.get() == "unified":
-                                # 尝试匹配任何URL
-                                url_match = re.search(r'https?://[^\s]+', cell.value)
-                                if url_match:
-                                    url = url_match.group(0)
-                                    display_text = unified_name
-                            
-                            # 网盘名称显示模式
-                            elif self.link_mode.get() == "display":
-                                # 合并预置和自定义的匹配规则
-                                all_patterns = {**self.cloud_storage_patterns, **self.custom_patterns}
-                                
-                                # 尝试匹配所有网盘样式
-                                for name, pattern in all_patterns.items():
-                                    match = re.search(pattern["pattern"], cell.value)
-                                    if match:
-                                        # 提取匹配到的URL
-                                        url = match.group(0)
-                                        display_text = pattern["display"]
-                                        break
-                            
-                            # 保持链接模式
-                            elif self.link_mode.get() == "keep":
-                                # 直接将单元格文本作为URL
-                                url = cell.value
-
-                            # 如果找到了有效的URL
-                            if url:
-                                # 设置超链接
-                                cell.hyperlink = url
-                                # 设置显示文本
-                                cell.value = display_text
-
-                                # 设置超链接样式（蓝色带下划线）
-                                cell.font = Font(underline="single", color="0563C1")
-
-                                processed += 1  # 增加计数
-
-            # 保存结果
-            wb.save(self.output_path.get())
-            # 记录成功日志
-            self.log_area.config(state=tk.NORMAL)
-            self.log_area.insert(tk.END, f"成功转换 {processed} 个链接\n", "success")
-            self.log_area.config(state=tk.DISABLED)
+            channel.set(files_total=max(len(list_workbooks(input_dir)), 1))
+            rows = convert_workbook_folder(input_dir, output_dir, direction, sheets, options, streaming,
+                                           workers, on_result, cancel)
+            report = write_batch_report(output_dir, rows, time.monotonic() - started)
+            failed = sum(1 for row in rows if row[1] == "失败")
+            summary = (f"{len(rows)} 个文件，失败 {failed} 个，共转换 {sum(row[2] for row in rows)} 个链接，"
+                       f"用时 {format_duration(time.monotonic() - started)}；报告：{report}")
+            if cancel.is_set():
+                self.log_queue.put(("warning", f"已取消：{summary}"))
+            else:
+                self.log_queue.put(("success" if not failed else "warning", f"批量转换完成：{summary}"))
         except Exception as e:
-            # 记录错误日志
-            self.log_area.config(state=tk.NORMAL)
-            self.log_area.insert(tk.END, f"错误：{str(e)}\n", "error")
-            self.log_area.config(state=tk.DISABLED)
+            self.log_queue.put(("error", f"错误：{str(e)}"))
+        finally:
+            self.running = False
+            channel.finish()
+
+    def current_link_options(self):
+        """收集文本转超链接的参数（支持统一显示名称）"""
+        # 获取统一显示名称（如果用户选择了该模式）
+        unified_name = None
+        if self.link_mode.get() == "unified":
+            unified_name = self.unified_display_name.get().strip()
+            if not unified_name:
+                self.log_queue.put(("warning", "警告：统一显示名称为空，将使用默认名称"))
+                unified_name = "资源链接"
+        # 合并预置和自定义的匹配规则
+        return link_options(self.link_mode.get(), self.get_link_matcher(), unified_name)
+
+    def get_link_matcher(self):
+        """返回编译好的样式匹配器，样式变化前重复使用"""
+        if self.link_matcher is None:
+            # 合并预置和自定义的匹配规则
+            self.link_matcher = LinkPatternMatcher(
+                collect_link_patterns(self.cloud_storage_patterns, self.custom_patterns))
+        return self.link_matcher
+
+    def invalidate_link_matcher(self):
+        """样式被添加、编辑或删除后，下次转换时重新编译"""
+        self.link_matcher = None
+
+    def convert_to_hyperlink(self):
+        """将文本转换为超链接（支持统一显示名称，后台执行）"""
+        if self.running:
+            return
+        self.start_job('to_link', self.current_link_options())
 
     def select_input(self):
         """选择输入文件并加载工作表"""
@@ -1010,6 +3836,29 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
             # 更新输出路径
             self.output_path.set(file_path)
 
+    def select_input_dir(self):
+        """选择批量模式的输入文件夹，并用其中第一个工作簿加载工作表列表"""
+        folder = filedialog.askdirectory(title="选择Excel文件夹")
+        if folder:
+            self.input_dir.set(folder)
+            self.batch_mode.set(True)
+            if not self.output_dir.get():
+                self.output_dir.set(os.path.join(folder, "转换版"))
+            try:
+                names = list_workbooks(folder)
+            except OSError as e:
+                messagebox.showerror("错误", f"读取文件夹失败：{str(e)}")
+                return
+            self.log_queue.put(("success", f"已选择文件夹：{folder}（{len(names)} 个工作簿）"))
+            if names:
+                self.load_sheets(os.path.join(folder, names[0]))
+
+    def select_output_dir(self):
+        """选择批量模式的输出文件夹"""
+        folder = filedialog.askdirectory(title="选择输出文件夹")
+        if folder:
+            self.output_dir.set(folder)
+
     def load_sheets(self, file_path):
         """加载工作表列表"""
         try:
@@ -1050,6 +3899,7 @@ class HyperlinkModule(BaseModule):  # 正确类名定义
             }
 
             # 保存到配置文件
+            self.invalidate_link_matcher()
             self.save_custom_patterns()
             # 刷新样式列表
             self.refresh_style_list()